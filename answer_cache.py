@@ -0,0 +1,366 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import Column, Float, MetaData, String, Table, Text, delete, select
+
+from document_store import DOCUMENT_STORE_URL, make_engine, upsert
+
+load_dotenv()
+
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "10000"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Disk tier for answers, shared across workers and restarts; set to an empty value to keep answers in memory only
+ANSWER_CACHE_URL = os.getenv("ANSWER_CACHE_URL", DOCUMENT_STORE_URL or "")
+ANSWER_CACHE_DISK_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_DISK_MAX_ENTRIES", "200000"))
+# Disk-tier writes between sweeps of expired and surplus rows
+ANSWER_CACHE_PRUNE_EVERY = 1000
+
+# Near-duplicate questions: minimum cosine similarity of their content-word vectors
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+SEMANTIC_CACHE_PER_DOCUMENT = int(os.getenv("SEMANTIC_CACHE_PER_DOCUMENT", "500"))
+SEMANTIC_CACHE_MAX_DOCUMENTS = int(os.getenv("SEMANTIC_CACHE_MAX_DOCUMENTS", "1000"))
+
+QUESTION_NOISE_PATTERN = re.compile(r"[^\w\s%.]|(?<!\d)\.|\.(?!\d)")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+NUMBER_PATTERN = re.compile(r"^\d+(?:\.\d+)?%?$")
+# Short labels naming one specific item: "Plan A", "Section 4B", "Form B2"
+IDENTIFIER_PATTERN = re.compile(r"(?<=\w )[A-HJ-Z]\b|\b(?:\d+[A-Za-z]|[A-Za-z]+\d)\w*")
+
+# Words that carry no meaning of their own in a question about a document
+QUESTION_STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "do", "does", "did", "what", "which",
+    "who", "whom", "when", "where", "why", "how", "much", "many", "there", "any", "of", "for", "to",
+    "in", "on", "at", "by", "with", "from", "as", "and", "or", "this", "that", "these", "those", "it",
+    "its", "under", "per", "can", "could", "will", "would", "shall", "should", "may", "i", "we", "you",
+    "my", "our", "your", "me", "please", "tell", "about", "explain", "describe", "give", "list",
+    # What is left of "doesn't", "isn't", ... once the "t" is read as a negation
+    "don", "doesn", "didn", "isn", "aren", "wasn", "weren", "won", "hasn", "haven", "hadn", "wouldn",
+    "couldn", "shouldn"
+}
+QUESTION_SUFFIXES = ("ations", "ation", "ments", "ment", "ings", "ing", "ies", "ed", "es", "s")
+# Negations flip what a question asks for, so they are kept (in one canonical
+# form per meaning) and must match; "t" is what is left of "n't"
+QUESTION_NEGATIONS = {
+    "not": "not", "no": "not", "never": "not", "cannot": "not", "t": "not", "without": "not",
+    "except": "except", "excluding": "except", "exclude": "except", "excludes": "except",
+    "excluded": "except", "exclusion": "except", "exclusions": "except",
+}
+NEGATION_TERMS = frozenset(QUESTION_NEGATIONS.values())
+# Words two paraphrases may differ by; any other content word one question has
+# and the other lacks means they ask about different things
+QUESTION_FILLER_WORDS = {
+    "policy", "document", "mean", "say", "says", "state", "stated", "mention", "mentioned", "know", "need",
+    "want", "kindly", "detail", "details", "information", "exactly", "specify", "specified", "get", "also",
+    "actually", "really"
+}
+
+
+def normalize_question(question: str) -> str:
+    """Case-, whitespace- and punctuation-insensitive form of a question (decimal points are kept)"""
+    question = QUESTION_NOISE_PATTERN.sub(" ", question.lower())
+    return WHITESPACE_PATTERN.sub(" ", question).strip()
+
+
+def question_identifiers(question: str) -> frozenset:
+    """Lower-cased item labels in a question, which must match exactly rather than by similarity"""
+    return frozenset(match.group(0).lower() for match in IDENTIFIER_PATTERN.finditer(question))
+
+
+def stem_question_word(word: str) -> str:
+    """Strip the first matching ``QUESTION_SUFFIXES`` ending, keeping at least three letters ("ies" becomes "y")"""
+    if not NUMBER_PATTERN.match(word):
+        for suffix in QUESTION_SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                return word[:-len(suffix)] + ("y" if suffix == "ies" else "")
+    return word
+
+
+def question_terms(question: str) -> frozenset:
+    """Crudely stemmed content words of a question, the features its similarity is measured on
+
+    Item labels from ``question_identifiers`` are kept as they are, even
+    single letters that would otherwise be dropped as stopwords, and
+    negations in their ``QUESTION_NEGATIONS`` form.
+    """
+    identifiers = question_identifiers(question)
+    terms = set(identifiers)
+    for word in normalize_question(question).split():
+        if word in QUESTION_NEGATIONS:
+            terms.add(QUESTION_NEGATIONS[word])
+        elif not (word in identifiers or word in QUESTION_STOPWORDS or (len(word) < 2 and not word.isdigit())):
+            terms.add(stem_question_word(word))
+    return frozenset(terms)
+
+
+QUESTION_FILLER_TERMS = frozenset(stem_question_word(word) for word in QUESTION_FILLER_WORDS)
+
+
+def question_negations(terms: frozenset) -> frozenset:
+    """The canonical negations among a question's terms"""
+    return frozenset(term for term in terms if term in NEGATION_TERMS)
+
+
+def answer_key(question: str, relevant_chunks: List[Dict]) -> str:
+    """Cache key for an answer: the normalized question plus the retrieved chunks, in prompt order
+
+    Chunks are identified by ``document_id`` (a content hash), ``chunk_id``
+    and their ``start``/``end`` offsets, so the same question over different
+    bytes, a different retrieval or a different chunking never shares an
+    answer.
+    """
+    parts = [normalize_question(question)]
+    parts.extend(
+        f"{chunk.get('document_id', '')}:{chunk['chunk_id']}:{chunk.get('start', '')}-{chunk.get('end', '')}"
+        for chunk in relevant_chunks
+    )
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+class SQLAnswerBackend:
+    """SQLAlchemy disk tier for the answer cache: one row per key with its expiry time"""
+
+    def __init__(self, url: str = ANSWER_CACHE_URL, max_entries: int = ANSWER_CACHE_DISK_MAX_ENTRIES):
+        self.engine = make_engine(url)
+        self.max_entries = max_entries
+
+        metadata = MetaData()
+        self.answers = Table(
+            "answer_cache", metadata,
+            Column("key", String(64), primary_key=True),
+            Column("value", Text, nullable=False),
+            Column("expires_at", Float, nullable=False, index=True),
+        )
+        metadata.create_all(self.engine)
+
+    def load(self, key: str) -> Optional[tuple]:
+        """Return ``(value, expires_at)`` for a key, or None"""
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(self.answers.c.value, self.answers.c.expires_at).where(self.answers.c.key == key)
+            ).first()
+        return (json.loads(row.value), row.expires_at) if row is not None else None
+
+    def save(self, key: str, value: Dict, expires_at: float):
+        values = {"value": json.dumps(value), "expires_at": expires_at}
+        with self.engine.begin() as conn:
+            upsert(conn, self.answers, {"key": key}, values)
+
+    def prune(self, now: float):
+        """Drop expired rows, then the soonest-expiring ones beyond ``max_entries``"""
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.answers).where(self.answers.c.expires_at <= now))
+            cutoff = conn.execute(
+                select(self.answers.c.expires_at).order_by(self.answers.c.expires_at.desc())
+                .offset(self.max_entries).limit(1)
+            ).scalar()
+            if cutoff is not None:
+                conn.execute(delete(self.answers).where(self.answers.c.expires_at <= cutoff))
+
+
+class AnswerCache:
+    """Answers keyed by document hash, normalized question and retrieved chunk ids
+
+    A thread-safe LRU of at most ``max_entries`` answers sits in front of an
+    optional SQLAlchemy disk tier; entries expire ``ttl`` seconds after they
+    were stored. Disk hits are promoted into memory.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES, ttl: float = ANSWER_CACHE_TTL_SECONDS,
+                 backend: Optional[SQLAnswerBackend] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+
+        if self.backend is not None:
+            try:
+                stored = self.backend.load(key)
+            except Exception as e:
+                print(f"⚠️  Answer cache read failed: {e}")
+                stored = None
+            if stored is not None and stored[1] > now:
+                with self._lock:
+                    self._remember(key, stored[0], stored[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                return stored[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: Dict):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self._writes += 1
+            prune = self._writes % ANSWER_CACHE_PRUNE_EVERY == 0
+
+        if self.backend is not None:
+            try:
+                self.backend.save(key, value, expires_at)
+                if prune:
+                    self.backend.prune(time.time())
+            except Exception as e:
+                print(f"⚠️  Answer cache write failed: {e}")
+
+    def _remember(self, key: str, value: Dict, expires_at: float):
+        self.entries[key] = (value, expires_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "disk_tier": self.backend is not None
+        }
+
+
+class SemanticAnswerCache:
+    """Per-document answers reused across paraphrases of the same question
+
+    Each answered question is stored as the set of its stemmed content words
+    (a binary bag-of-words vector) in an inverted index per document, so a
+    lookup only scores past questions sharing a word with the new one. A
+    past answer is reused when the cosine similarity reaches ``threshold``,
+    both questions mention the same numbers, item labels ("Plan A" never
+    answers "Plan B") and negations ("not covered" never answers "covered"),
+    neither has a content word the other lacks beyond
+    ``QUESTION_FILLER_TERMS`` ("hernia" never answers "cataract"), and the
+    two retrievals share at least one chunk.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, ttl: float = ANSWER_CACHE_TTL_SECONDS,
+                 max_per_document: int = SEMANTIC_CACHE_PER_DOCUMENT,
+                 max_documents: int = SEMANTIC_CACHE_MAX_DOCUMENTS):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_per_document = max_per_document
+        self.max_documents = max_documents
+        self.documents = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _document_key(relevant_chunks: List[Dict]) -> str:
+        return ",".join(sorted({chunk.get("document_id") or "" for chunk in relevant_chunks}))
+
+    @staticmethod
+    def _chunk_ids(relevant_chunks: List[Dict]) -> frozenset:
+        return frozenset(f"{chunk.get('document_id', '')}:{chunk['chunk_id']}" for chunk in relevant_chunks)
+
+    def get(self, question: str, relevant_chunks: List[Dict]) -> Optional[Dict]:
+        """Answer of the most similar past question on the same document, or None"""
+        terms = question_terms(question)
+        numbers = {term for term in terms if NUMBER_PATTERN.match(term)}
+        identifiers = question_identifiers(question)
+        negations = question_negations(terms)
+        chunk_ids = self._chunk_ids(relevant_chunks)
+        now = time.time()
+        with self._lock:
+            document = self.documents.get(self._document_key(relevant_chunks))
+            best, best_score = None, 0.0
+            if document is not None and terms:
+                entries, postings = document
+                shared = {}
+                for term in terms:
+                    for entry_id in postings.get(term, ()):
+                        shared[entry_id] = shared.get(entry_id, 0) + 1
+                for entry_id, overlap in shared.items():
+                    entry = entries[entry_id]
+                    score = overlap / (len(terms) * len(entry["terms"])) ** 0.5
+                    if (score >= self.threshold and score > best_score and entry["expires_at"] > now
+                            and entry["numbers"] == numbers and entry["identifiers"] == identifiers
+                            and entry["negations"] == negations
+                            and (entry["terms"] ^ terms) <= QUESTION_FILLER_TERMS
+                            and entry["chunk_ids"] & chunk_ids):
+                        best, best_score = entry, score
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return dict(best["value"], question=best["question"], similarity=round(best_score, 3))
+
+    def put(self, question: str, relevant_chunks: List[Dict], value: Dict):
+        terms = question_terms(question)
+        if not terms:
+            return
+        document_key = self._document_key(relevant_chunks)
+        with self._lock:
+            document = self.documents.get(document_key)
+            if document is None:
+                document = self.documents[document_key] = (OrderedDict(), {})
+                while len(self.documents) > self.max_documents:
+                    self.documents.popitem(last=False)
+            else:
+                self.documents.move_to_end(document_key)
+            entries, postings = document
+
+            entry_id = self._next_id
+            self._next_id += 1
+            entries[entry_id] = {
+                "question": question,
+                "terms": terms,
+                "numbers": {term for term in terms if NUMBER_PATTERN.match(term)},
+                "identifiers": question_identifiers(question),
+                "negations": question_negations(terms),
+                "chunk_ids": self._chunk_ids(relevant_chunks),
+                "value": value,
+                "expires_at": time.time() + self.ttl
+            }
+            for term in terms:
+                postings.setdefault(term, set()).add(entry_id)
+
+            while len(entries) > self.max_per_document:
+                expired_id, expired = entries.popitem(last=False)
+                for term in expired["terms"]:
+                    ids = postings.get(term)
+                    ids.discard(expired_id)
+                    if not ids:
+                        del postings[term]
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "documents": len(self.documents),
+            "questions": sum(len(entries) for entries, _ in self.documents.values()),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None
+        }
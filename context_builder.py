@@ -0,0 +1,122 @@
+import os
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Prompt budget for retrieved clauses, in approximate tokens (CHARS_PER_TOKEN characters each)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+CHARS_PER_TOKEN = 4
+# Adaptive k: a hit is kept while its score is at least this share of the top score...
+CONTEXT_MIN_SCORE_RATIO = float(os.getenv("CONTEXT_MIN_SCORE_RATIO", "0.4"))
+# ...and at least this share of the previous kept hit's score (stops at the first steep drop)
+CONTEXT_SCORE_GAP_RATIO = float(os.getenv("CONTEXT_SCORE_GAP_RATIO", "0.6"))
+# A clause cut by the budget is only kept if at least this much of it fits
+CONTEXT_MIN_TAIL_CHARS = 200
+
+
+def select_context_hits(hits: List[Dict], min_ratio: float = CONTEXT_MIN_SCORE_RATIO,
+                        gap_ratio: float = CONTEXT_SCORE_GAP_RATIO) -> List[Dict]:
+    """Choose k from the score distribution: the best hit, then hits until the scores fall away"""
+    ranked = sorted(hits, key=lambda hit: hit.get("score", 0), reverse=True)
+    if not ranked or ranked[0].get("score", 0) <= 0:
+        return ranked
+    top = ranked[0]["score"]
+    selected = ranked[:1]
+    for hit in ranked[1:]:
+        score = hit.get("score", 0)
+        if score < top * min_ratio or score < selected[-1]["score"] * gap_ratio:
+            break
+        selected.append(hit)
+    return selected
+
+
+def merge_hits(hits: List[Dict]) -> List[Dict]:
+    """Merge hits whose spans of the same document touch or overlap into single segments
+
+    Chunks are offsets into one normalized text, so two overlapping chunks
+    are joined by appending only the part of the later one past the end of
+    the earlier; the shared span is sent once. Adjacent chunks one character
+    apart (the single space normalization leaves between them) are joined
+    with that space. Hits without offsets are kept
+    as they are, minus exact duplicates. Segments come back best score first.
+    """
+    segments = []
+    positioned = sorted(
+        (hit for hit in hits if hit.get("start") is not None and hit.get("end") is not None),
+        key=lambda hit: (hit.get("document_id") or "", hit["start"], -hit["end"])
+    )
+    for hit in positioned:
+        segment = segments[-1] if segments else None
+        if (segment is not None and segment["document_id"] == hit.get("document_id")
+                and hit["start"] <= segment["end"] + 1):
+            if hit["start"] > segment["end"]:
+                segment["text"] += " " + hit["text"]
+                segment["end"] = hit["end"]
+            elif hit["end"] > segment["end"]:
+                segment["text"] += hit["text"][segment["end"] - hit["start"]:]
+                segment["end"] = hit["end"]
+            if hit["chunk_id"] not in segment["chunk_ids"]:
+                segment["chunk_ids"].append(hit["chunk_id"])
+            segment["score"] = max(segment["score"], hit.get("score", 0))
+            continue
+        segments.append({
+            "document_id": hit.get("document_id"),
+            "start": hit["start"],
+            "end": hit["end"],
+            "text": hit["text"],
+            "chunk_ids": [hit["chunk_id"]],
+            "score": hit.get("score", 0)
+        })
+
+    seen = {segment["text"] for segment in segments}
+    for hit in hits:
+        if (hit.get("start") is None or hit.get("end") is None) and hit["text"] not in seen:
+            seen.add(hit["text"])
+            segments.append({
+                "document_id": hit.get("document_id"),
+                "start": None,
+                "end": None,
+                "text": hit["text"],
+                "chunk_ids": [hit["chunk_id"]],
+                "score": hit.get("score", 0)
+            })
+
+    segments.sort(key=lambda segment: segment["score"], reverse=True)
+    return segments
+
+
+def trim_to_budget(text: str, max_chars: int) -> str:
+    """Cut text to at most max_chars, at the last sentence end (or else word break) that fits"""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    sentence_end = max(cut.rfind(". "), cut.rfind("? "), cut.rfind("! "))
+    if sentence_end >= max_chars // 2:
+        return cut[:sentence_end + 1]
+    space = cut.rfind(" ")
+    return cut[:space] if space > 0 else cut
+
+
+def build_context(hits: List[Dict], token_budget: int = None, adaptive: bool = True) -> str:
+    """Prompt context from retrieved chunks: adaptive k, overlaps merged, duplicates dropped, within a token budget"""
+    if adaptive:
+        hits = select_context_hits(hits)
+    max_chars = (token_budget or CONTEXT_TOKEN_BUDGET) * CHARS_PER_TOKEN
+
+    parts = []
+    used = 0
+    for segment in merge_hits(hits):
+        label = f"[Clause {', '.join(segment['chunk_ids'])}]: "
+        room = max_chars - used - len(label)
+        text = segment["text"]
+        if len(text) > room:
+            if parts and room < CONTEXT_MIN_TAIL_CHARS:
+                break
+            text = trim_to_budget(text, max(room, CONTEXT_MIN_TAIL_CHARS))
+        parts.append(label + text)
+        used += len(label) + len(text) + 2
+        if used >= max_chars:
+            break
+    return "\n\n".join(parts)
@@ -0,0 +1,320 @@
+import os
+import json
+import zlib
+import pickle
+import asyncio
+import threading
+from datetime import datetime
+from concurrent.futures import Executor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from dotenv import load_dotenv
+from sqlalchemy import Column, LargeBinary, MetaData, String, Table, Text, and_, create_engine, event, select, update, insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+load_dotenv()
+
+# Persistent document store; set to an empty value to keep everything in memory only
+DOCUMENT_STORE_URL = os.getenv("DOCUMENT_STORE_URL", "sqlite:///hackrx_store.db")
+
+# Signing parameters of pre-signed URLs, which change between fetches of the
+# same blob. Each provider's set is ignored only when all of its marker
+# parameters are present, so a plain "?policy=HLTH-001" still tells URLs apart.
+AZURE_SAS_PARAMS = {
+    "sv", "st", "se", "sr", "sp", "sig", "spr", "srt", "ss", "si", "sip",
+    "skoid", "sktid", "skt", "ske", "sks", "skv", "sdd", "rscc", "rscd", "rsce", "rscl", "rsct",
+}
+AWS_SIGV4_PARAMS = {
+    "x-amz-algorithm", "x-amz-credential", "x-amz-date", "x-amz-expires", "x-amz-signature",
+    "x-amz-signedheaders", "x-amz-security-token",
+}
+GCS_SIGV4_PARAMS = {
+    "x-goog-algorithm", "x-goog-credential", "x-goog-date", "x-goog-expires", "x-goog-signature",
+    "x-goog-signedheaders",
+}
+SIGNED_URL_PARAMS = [
+    ({"sig"}, AZURE_SAS_PARAMS),
+    ({"x-amz-signature"}, AWS_SIGV4_PARAMS),
+    ({"awsaccesskeyid", "signature", "expires"}, {"awsaccesskeyid", "signature", "expires", "x-amz-security-token"}),
+    ({"x-goog-signature"}, GCS_SIGV4_PARAMS),
+    # CloudFront custom and canned policies
+    ({"policy", "signature", "key-pair-id"}, {"policy", "signature", "key-pair-id"}),
+    ({"expires", "signature", "key-pair-id"}, {"expires", "signature", "key-pair-id"}),
+]
+# Further parameters to ignore in every URL, for sources known to add cache-busting or auth params
+VOLATILE_QUERY_PARAMS = {
+    param.strip().lower() for param in os.getenv("VOLATILE_QUERY_PARAMS", "").split(",") if param.strip()
+}
+
+
+def normalize_document_url(url: str) -> str:
+    """Canonical alias key for a document URL, ignoring the signing parameters of pre-signed URLs"""
+    parts = urlsplit(url.strip())
+    params = parse_qsl(parts.query, keep_blank_values=True)
+    names = {key.lower() for key, _ in params}
+    volatile = set(VOLATILE_QUERY_PARAMS)
+    for markers, signing in SIGNED_URL_PARAMS:
+        if markers <= names:
+            volatile |= signing
+    query = sorted((key, value) for key, value in params if key.lower() not in volatile)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(query), ""))
+
+
+_engines: Dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
+
+def _enable_sqlite_wal(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def make_engine(url: str) -> Engine:
+    """The process-wide engine for a database URL, so tables in one file share a connection pool
+
+    SQLite engines allow use from any thread and put each connection in WAL
+    mode, so readers in other workers are not blocked by a writer.
+    """
+    with _engines_lock:
+        engine = _engines.get(url)
+        if engine is None:
+            connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+            engine = create_engine(url, connect_args=connect_args)
+            if url.startswith("sqlite"):
+                event.listen(engine, "connect", _enable_sqlite_wal)
+            _engines[url] = engine
+        return engine
+
+
+def upsert(conn: Connection, table: Table, key: Dict[str, Any], values: Dict[str, Any]):
+    """Update the row matching ``key`` or insert it; when another worker inserts first, its row is updated"""
+    where = and_(*(table.c[column] == value for column, value in key.items()))
+    if conn.execute(update(table).where(where).values(**values)).rowcount:
+        return
+    try:
+        with conn.begin_nested():
+            conn.execute(insert(table).values(**key, **values))
+    except IntegrityError:
+        conn.execute(update(table).where(where).values(**values))
+
+
+class SQLDocumentBackend:
+    """SQLAlchemy persistence for document metadata, URL aliases, chunks and indexes
+
+    Listing metadata is small and read once at startup; the normalized text,
+    its serialized chunk offsets and pickled retrieval indexes live in
+    compressed blob columns that are only read when a document is first
+    queried after a restart.
+    """
+
+    def __init__(self, url: str = DOCUMENT_STORE_URL):
+        self.engine = make_engine(url)
+
+        metadata = MetaData()
+        self.documents = Table(
+            "documents", metadata,
+            Column("document_id", String(64), primary_key=True),
+            Column("info", Text),
+            Column("text", LargeBinary),
+            Column("chunks", LargeBinary),
+            Column("indexes", LargeBinary),
+        )
+        self.aliases = Table(
+            "document_aliases", metadata,
+            Column("url_key", String(2048), primary_key=True),
+            Column("document_id", String(64), nullable=False),
+        )
+        metadata.create_all(self.engine)
+
+    def _upsert_document(self, document_id: str, values: Dict):
+        with self.engine.begin() as conn:
+            upsert(conn, self.documents, {"document_id": document_id}, values)
+
+    def save_info(self, document_id: str, info: Dict):
+        self._upsert_document(document_id, {"info": json.dumps(info)})
+
+    def save_content(self, document_id: str, text: str, chunk_offsets: bytes, indexes: Tuple):
+        self._upsert_document(document_id, {
+            "text": zlib.compress(text.encode("utf-8")),
+            "chunks": zlib.compress(chunk_offsets),
+            "indexes": pickle.dumps(indexes, protocol=pickle.HIGHEST_PROTOCOL),
+        })
+
+    def save_alias(self, url_key: str, document_id: str):
+        with self.engine.begin() as conn:
+            upsert(conn, self.aliases, {"url_key": url_key}, {"document_id": document_id})
+
+    def load_infos(self) -> Dict[str, Dict]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(self.documents.c.document_id, self.documents.c.info).where(self.documents.c.info.isnot(None))
+            )
+            return {document_id: json.loads(info) for document_id, info in rows}
+
+    def load_info(self, document_id: str) -> Optional[Dict]:
+        with self.engine.connect() as conn:
+            info = conn.execute(
+                select(self.documents.c.info).where(self.documents.c.document_id == document_id)
+            ).scalar()
+        return json.loads(info) if info else None
+
+    def lookup_alias(self, url_key: str) -> Optional[str]:
+        with self.engine.connect() as conn:
+            return conn.execute(select(self.aliases.c.document_id).where(self.aliases.c.url_key == url_key)).scalar()
+
+    def load_aliases(self) -> Dict[str, str]:
+        with self.engine.connect() as conn:
+            return dict(conn.execute(select(self.aliases.c.url_key, self.aliases.c.document_id)).all())
+
+    def load_content(self, document_id: str) -> Optional[Tuple[str, bytes, Tuple]]:
+        """Return ``(text, chunk_offsets, indexes)`` for a document, or None if it was never stored"""
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(self.documents.c.text, self.documents.c.chunks, self.documents.c.indexes)
+                .where(self.documents.c.document_id == document_id)
+            ).first()
+        if row is None or row.chunks is None or row.text is None:
+            return None
+        text = zlib.decompress(row.text).decode("utf-8")
+        indexes = pickle.loads(row.indexes) if row.indexes is not None else None
+        return text, zlib.decompress(row.chunks), indexes
+
+
+class DocumentStore:
+    """Content-addressed registry of processed documents
+
+    Documents are keyed by the SHA-256 of their bytes, so the same file is
+    processed once however it arrives. URLs are mapped to that hash through
+    an alias table keyed by ``normalize_document_url``. With a backend, the
+    registry survives restarts: listing metadata and aliases are read at
+    startup while chunks and indexes stay on disk until first use. Misses
+    fall through to the backend, so several worker processes sharing one
+    database see each other's documents. Async handlers use the ``a*``
+    methods, which run the lookups on ``executor`` since a miss reads the
+    database.
+    """
+
+    def __init__(self, backend: Optional[SQLDocumentBackend] = None, executor: Optional[Executor] = None):
+        self.backend = backend
+        self.executor = executor
+        self.documents = backend.load_infos() if backend is not None else {}
+        self.aliases = backend.load_aliases() if backend is not None else {}
+
+    def __contains__(self, document_id: str) -> bool:
+        return self.get(document_id) is not None
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def get(self, document_id: str) -> Optional[Dict]:
+        entry = self.documents.get(document_id)
+        if entry is None and self.backend is not None:
+            # Possibly ingested by another worker process
+            entry = self.backend.load_info(document_id)
+            if entry is not None:
+                self.documents[document_id] = entry
+        return entry
+
+    def values(self) -> List[Dict]:
+        if self.backend is not None:
+            self.documents.update(self.backend.load_infos())
+        return list(self.documents.values())
+
+    def resolve_url(self, url: str) -> Optional[str]:
+        """Return the document_id previously fetched from an equivalent URL"""
+        url_key = normalize_document_url(url)
+        document_id = self.aliases.get(url_key)
+        if document_id is None and self.backend is not None:
+            document_id = self.backend.lookup_alias(url_key)
+            if document_id is not None:
+                self.aliases[url_key] = document_id
+        return document_id if document_id is not None and document_id in self else None
+
+    def add_alias(self, url: str, document_id: str):
+        url_key = normalize_document_url(url)
+        if self.aliases.get(url_key) == document_id:
+            return
+        self.aliases[url_key] = document_id
+        if self.backend is not None:
+            try:
+                self.backend.save_alias(url_key, document_id)
+            except Exception as e:
+                print(f"⚠️  Failed to persist alias for {document_id[:12]}: {e}")
+
+    def evict(self, document_id: str, reloadable: bool = False):
+        """Forget a document evicted from the processor's memory cache
+
+        Without a backend, entries of reloadable documents are tiny and kept;
+        entries of documents that cannot be reloaded are dropped with their
+        aliases so the URL is ingested again. With a backend, the entry is
+        simply reloaded from it on the next lookup.
+        """
+        if reloadable and self.backend is None:
+            return
+        self.documents.pop(document_id, None)
+        for url_key in [key for key, value in self.aliases.items() if value == document_id]:
+            del self.aliases[url_key]
+
+    async def _run(self, fn: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def aget(self, document_id: str) -> Optional[Dict]:
+        return await self._run(self.get, document_id)
+
+    async def avalues(self) -> List[Dict]:
+        return await self._run(self.values)
+
+    async def aresolve_url(self, url: str) -> Optional[str]:
+        return await self._run(self.resolve_url, url)
+
+    async def aadd(self, document_id: str, info: Dict, url: str = None) -> Dict:
+        return await self._run(self.add, document_id, info, url)
+
+    def add(self, document_id: str, info: Dict, url: str = None) -> Dict:
+        """Register a processed document; an already known hash keeps its first entry"""
+        entry = self.documents.get(document_id)
+        if entry is None:
+            entry = dict(info, document_id=document_id, created_at=datetime.now().isoformat(timespec="seconds"))
+            self.documents[document_id] = entry
+            if self.backend is not None:
+                try:
+                    self.backend.save_info(document_id, entry)
+                except Exception as e:
+                    print(f"⚠️  Failed to persist document {document_id[:12]}: {e}")
+        if url:
+            self.add_alias(url, document_id)
+        return entry
+
+
+class SingleFlight:
+    """Coalesce concurrent async calls that share a key into one in-flight call
+
+    The first caller for a key starts the work; later callers await the same
+    future until it settles, then the key is forgotten. Waiters are shielded
+    so one cancelled request does not cancel the ingest others depend on.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(future)
+
+    def _forget(self, key: str, future: asyncio.Future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.cancelled():
+            # Mark the exception as retrieved even if every waiter went away
+            future.exception()
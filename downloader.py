@@ -0,0 +1,190 @@
+import os
+import asyncio
+import hashlib
+import tempfile
+from typing import Optional, Union
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_BYTES", str(512 * 1024 * 1024)))
+DOWNLOAD_SPOOL_MEMORY_BYTES = int(os.getenv("DOWNLOAD_SPOOL_MEMORY_BYTES", str(8 * 1024 * 1024)))
+DOWNLOAD_SPOOL_DIR = os.getenv("DOWNLOAD_SPOOL_DIR") or None
+DOWNLOAD_CONNECT_TIMEOUT = float(os.getenv("DOWNLOAD_CONNECT_TIMEOUT", "10"))
+DOWNLOAD_READ_TIMEOUT = float(os.getenv("DOWNLOAD_READ_TIMEOUT", "30"))
+DOWNLOAD_TOTAL_TIMEOUT = float(os.getenv("DOWNLOAD_TOTAL_TIMEOUT", "300"))
+DOWNLOAD_MAX_CONNECTIONS = int(os.getenv("DOWNLOAD_MAX_CONNECTIONS", "20"))
+DOWNLOAD_MAX_RESUMES = int(os.getenv("DOWNLOAD_MAX_RESUMES", "3"))
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+
+class SpooledDocument:
+    """A document body held in memory while small and spooled to a temp file once large
+
+    Bytes are hashed as they are written, so the SHA-256 is ready as soon as
+    the last chunk arrives. ``content`` is either the raw bytes or the path of
+    the spool file, which is exactly what the extractors accept.
+    """
+
+    def __init__(self, max_memory: int = DOWNLOAD_SPOOL_MEMORY_BYTES, spool_dir: Optional[str] = DOWNLOAD_SPOOL_DIR,
+                 suffix: str = ""):
+        self.max_memory = max_memory
+        self.spool_dir = spool_dir
+        self.suffix = suffix
+        self.content_type = None
+        self._hasher = hashlib.sha256()
+        self._buffer = bytearray()
+        self._file = None
+        self.path = None
+        self.size = 0
+
+    def write(self, data: bytes):
+        self._hasher.update(data)
+        self.size += len(data)
+        if self._file is None and len(self._buffer) + len(data) > self.max_memory:
+            self._file = tempfile.NamedTemporaryFile(delete=False, dir=self.spool_dir, suffix=self.suffix,
+                                                     prefix="hackrx-")
+            self.path = self._file.name
+            self._file.write(self._buffer)
+            self._buffer = bytearray()
+        if self._file is not None:
+            self._file.write(data)
+        else:
+            self._buffer += data
+
+    def reset(self):
+        """Discard everything written so far"""
+        self.close()
+        self._hasher = hashlib.sha256()
+        self._buffer = bytearray()
+        self.size = 0
+
+    def finish(self) -> "SpooledDocument":
+        if self._file is not None:
+            self._file.close()
+        return self
+
+    @property
+    def sha256(self) -> str:
+        return self._hasher.hexdigest()
+
+    @property
+    def content(self) -> Union[bytes, str]:
+        return bytes(self._buffer) if self.path is None else self.path
+
+    def close(self):
+        """Delete the spool file, if any"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+        self._buffer = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncDocumentDownloader:
+    """Streaming document downloader sharing one pooled httpx client
+
+    Bodies are streamed into a SpooledDocument, so large PDFs never sit fully
+    in memory. Downloads enforce a size cap, per-phase (connect/read/write/pool)
+    timeouts plus an overall deadline, and resume interrupted transfers with
+    HTTP range requests when the server advertises ``Accept-Ranges: bytes``.
+    """
+
+    def __init__(self, max_bytes: int = DOWNLOAD_MAX_BYTES, max_connections: int = DOWNLOAD_MAX_CONNECTIONS,
+                 max_resumes: int = DOWNLOAD_MAX_RESUMES, total_timeout: float = DOWNLOAD_TOTAL_TIMEOUT):
+        self.max_bytes = max_bytes
+        self.max_connections = max_connections
+        self.max_resumes = max_resumes
+        self.total_timeout = total_timeout
+        self.timeout = httpx.Timeout(
+            connect=DOWNLOAD_CONNECT_TIMEOUT,
+            read=DOWNLOAD_READ_TIMEOUT,
+            write=DOWNLOAD_READ_TIMEOUT,
+            pool=DOWNLOAD_CONNECT_TIMEOUT
+        )
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def download(self, url: str) -> SpooledDocument:
+        """Stream a document into a SpooledDocument; the caller must close() it"""
+        suffix = os.path.splitext(url.split('?')[0])[1][:10]
+        body = SpooledDocument(suffix=suffix)
+        try:
+            await asyncio.wait_for(self._download_into(url, body), timeout=self.total_timeout)
+            return body.finish()
+        except asyncio.TimeoutError:
+            body.close()
+            raise Exception(f"Failed to download document: exceeded {self.total_timeout:.0f}s total timeout")
+        except Exception as e:
+            body.close()
+            raise Exception(f"Failed to download document: {str(e)}")
+
+    async def _download_into(self, url: str, body: SpooledDocument):
+        resumes = 0
+        validator = None
+        while True:
+            headers = {}
+            can_resume = False
+            if body.size:
+                headers["Range"] = f"bytes={body.size}-"
+                if validator:
+                    headers["If-Range"] = validator
+
+            try:
+                async with self.client.stream("GET", url, headers=headers) as response:
+                    response.raise_for_status()
+
+                    if body.size and response.status_code != 206:
+                        # Server ignored the range (or the resource changed): start over
+                        body.reset()
+
+                    if not body.size:
+                        declared = response.headers.get("Content-Length")
+                        if declared and declared.isdigit() and int(declared) > self.max_bytes:
+                            raise Exception(f"document is {int(declared)} bytes, limit is {self.max_bytes}")
+                        body.content_type = response.headers.get("Content-Type")
+                        validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+
+                    can_resume = response.headers.get("Accept-Ranges", "").lower() == "bytes" or response.status_code == 206
+
+                    async for data in response.aiter_bytes(DOWNLOAD_CHUNK_BYTES):
+                        if body.size + len(data) > self.max_bytes:
+                            raise Exception(f"document exceeds the {self.max_bytes} byte limit")
+                        body.write(data)
+                return
+
+            except (httpx.ReadError, httpx.ReadTimeout, httpx.RemoteProtocolError) as e:
+                if not body.size or not can_resume or resumes >= self.max_resumes:
+                    raise
+                resumes += 1
+                print(f"Download interrupted after {body.size} bytes ({type(e).__name__}), resuming ({resumes}/{self.max_resumes})")
@@ -0,0 +1,127 @@
+import os
+import re
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from answer_cache import NUMBER_PATTERN, question_identifiers, question_terms
+from sentences import KEYWORD_CLAUSE_PATTERN, NUMBERED_CLAUSE_PATTERN, split_sentences
+
+load_dotenv()
+
+# Answer simple duration/amount/percentage lookups straight from the top clause, skipping Gemini
+EXTRACTIVE_ANSWERS = os.getenv("EXTRACTIVE_ANSWERS", "true").lower() in ("1", "true", "yes")
+# Share of the question's content words the answering sentence must contain to skip the LLM...
+EXTRACTIVE_MIN_COVERAGE = float(os.getenv("EXTRACTIVE_MIN_COVERAGE", "0.6"))
+# ...and the looser bar for answering this way when the LLM call failed or timed out
+EXTRACTIVE_FALLBACK_COVERAGE = float(os.getenv("EXTRACTIVE_FALLBACK_COVERAGE", "0.5"))
+# Lead the best sentence must have over any sentence giving a different value
+EXTRACTIVE_MARGIN = 0.2
+# Retrieved chunks searched for the answering sentence, best first
+EXTRACTIVE_MAX_CHUNKS = 2
+
+NUMBER_WORDS = r"(?:one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve|fifteen|twenty|thirty|forty|forty-five|sixty|ninety)"
+QUANTITY = rf"(?:\d[\d,]*(?:\.\d+)?|{NUMBER_WORDS})"
+VALUE_PATTERNS = {
+    "duration": re.compile(
+        rf"\b{QUANTITY}(?:\s*\(\d+\))?[\s-]*(?:calendar\s+|consecutive\s+|working\s+)?"
+        r"(?:days?|weeks?|months?|years?|hours?)\b", re.IGNORECASE
+    ),
+    "amount": re.compile(
+        r"(?:(?:\$|₹|€|£|\b(?:rs\.?|inr|usd|eur|gbp)\s?)\s?\d[\d,]*(?:\.\d+)?(?:\s?(?:lakhs?|crores?|million|thousand|k)\b)?"
+        r"|\b\d[\d,]*(?:\.\d+)?\s?(?:lakhs?|crores?|rupees|dollars)\b)",
+        re.IGNORECASE
+    ),
+    "percentage": re.compile(rf"\b{QUANTITY}(?:\.\d+)?\s?(?:%|per\s?cent\b|percent\b)", re.IGNORECASE),
+}
+
+# Question wording that asks for each kind of value
+QUESTION_CUES = {
+    "duration": re.compile(
+        r"\b(?:period|how long|duration|days?|months?|years?|weeks?|time limit|within|deadline|notice)\b",
+        re.IGNORECASE
+    ),
+    "amount": re.compile(
+        r"\b(?:amount|how much|limit|sum insured|maximum|minimum|cost|price|fee|premium amount|cap|"
+        r"coverage amount|payable|reimburse\w*)\b",
+        re.IGNORECASE
+    ),
+    "percentage": re.compile(
+        r"\b(?:percent\w*|percentage|rate|discount|co-?pay\w*|share|proportion)\b|%", re.IGNORECASE
+    ),
+}
+
+# Lead-ins dropped from the answer sentence: clause numbers ("4.2 ", "Section 4 -"),
+# then a "Grace Period: ..." style label or an all-caps heading ("GRACE PERIOD The ...")
+LEAD_LABEL_PATTERN = re.compile(r"^[A-Z][\w /&-]{0,40}:\s+")
+LEAD_HEADING_PATTERN = re.compile(r"^[A-Z][A-Z&/-]+(?:\s+[A-Z][A-Z&/-]+)+\s+(?=[A-Z](?:[a-z]|\s[a-z]))")
+
+
+def wanted_kinds(question: str) -> List[str]:
+    """Value kinds (duration, amount, percentage) the question's wording asks for"""
+    return [kind for kind, pattern in QUESTION_CUES.items() if pattern.search(question)]
+
+
+def strip_lead_in(sentence: str) -> str:
+    """A sentence without the clause number, label or heading it opens with"""
+    match = KEYWORD_CLAUSE_PATTERN.match(sentence) or NUMBERED_CLAUSE_PATTERN.match(sentence)
+    if match and match.group(2):
+        sentence = match.group(2)
+    return LEAD_HEADING_PATTERN.sub("", LEAD_LABEL_PATTERN.sub("", sentence))
+
+
+def extract_answer(question: str, relevant_chunks: List[Dict], min_coverage: float = EXTRACTIVE_MIN_COVERAGE,
+                   margin: float = EXTRACTIVE_MARGIN) -> Optional[Dict]:
+    """Sentence from the top-ranked clauses that states the value the question asks for, or None
+
+    A sentence qualifies when it holds exactly one value of a wanted kind,
+    repeats any number or item label the question mentions, and contains at least
+    ``min_coverage`` of the question's content words.
+    The best one is returned only if it leads every sentence giving a
+    different value by ``margin``, so ambiguous clauses go to the LLM.
+    """
+    kinds = wanted_kinds(question)
+    terms = question_terms(question)
+    if not kinds or not terms or not relevant_chunks:
+        return None
+    # A number or item label in the question ("a 15 day grace period?", "Plan B?") must be the one the sentence states
+    numbers = {term for term in terms if NUMBER_PATTERN.match(term)} | question_identifiers(question)
+
+    candidates = []
+    for rank, chunk in enumerate(relevant_chunks[:EXTRACTIVE_MAX_CHUNKS]):
+        for sentence in split_sentences(chunk["text"]):
+            for kind in kinds:
+                values = {match.group(0).strip().lower() for match in VALUE_PATTERNS[kind].finditer(sentence)}
+                if len(values) != 1:
+                    continue
+                sentence_terms = question_terms(sentence)
+                if not numbers <= sentence_terms:
+                    continue
+                coverage = len(terms & sentence_terms) / len(terms)
+                candidates.append({
+                    "coverage": coverage,
+                    "rank": rank,
+                    "kind": kind,
+                    "value": values.pop(),
+                    "sentence": sentence,
+                    "chunk_id": chunk["chunk_id"]
+                })
+
+    if not candidates:
+        return None
+    candidates.sort(key=lambda candidate: (-candidate["coverage"], candidate["rank"]))
+    best = candidates[0]
+    if best["coverage"] < min_coverage:
+        return None
+    for other in candidates[1:]:
+        if other["value"] != best["value"] and best["coverage"] - other["coverage"] < margin:
+            return None
+
+    answer = strip_lead_in(best["sentence"])
+    return {
+        "answer": answer[0].upper() + answer[1:],
+        "value": best["value"],
+        "kind": best["kind"],
+        "confidence": round(best["coverage"], 3),
+        "chunk_id": best["chunk_id"]
+    }
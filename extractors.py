@@ -0,0 +1,406 @@
+import os
+import time
+import zipfile
+import threading
+import xml.etree.ElementTree as ElementTree
+from io import BytesIO
+from typing import Callable, Dict, List, Optional, Union
+
+import PyPDF2
+import docx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Faster PDF engines are optional; PyPDF2 is always installed and always tried last
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+
+# Preferred PDF engine order until timings have been measured
+PDF_EXTRACTION_ENGINES = [
+    engine.strip().lower() for engine in os.getenv("PDF_EXTRACTION_ENGINES", "pymupdf,pypdfium2,pypdf2").split(",")
+    if engine.strip()
+]
+# Runs per engine and document class before measured timings override the configured order
+EXTRACTION_MIN_SAMPLES = int(os.getenv("EXTRACTION_MIN_SAMPLES", "5"))
+
+SNIFF_BYTES = 2048
+
+CONTENT_TYPE_FORMATS = {
+    "application/pdf": "pdf",
+    "application/x-pdf": "pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+    "application/msword": "doc",
+    "text/plain": "txt",
+    "text/markdown": "txt",
+    "text/csv": "txt",
+}
+
+EXTENSION_FORMATS = {
+    ".pdf": "pdf",
+    ".docx": "docx",
+    ".doc": "doc",
+    ".txt": "txt",
+    ".md": "txt",
+    ".csv": "txt",
+}
+
+ZIP_MAGIC = b"PK\x03\x04"
+OLE2_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+
+def _open_binary(content: Union[bytes, str]):
+    return open(content, 'rb') if isinstance(content, str) else BytesIO(content)
+
+
+def read_head(content: Union[bytes, str], size: int = SNIFF_BYTES) -> bytes:
+    """First bytes of a document held as bytes or as a file path"""
+    if isinstance(content, str):
+        with open(content, 'rb') as file:
+            return file.read(size)
+    return bytes(content[:size])
+
+
+def _looks_like_text(head: bytes) -> bool:
+    if not head or b"\x00" in head:
+        return False
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off by the sniff window is still text
+        return e.start >= len(head) - 3 and e.reason == "unexpected end of data"
+    return True
+
+
+def detect_format(content: Union[bytes, str], content_type: str = None, name: str = None) -> Optional[str]:
+    """Document format from magic bytes, then the Content-Type header, then the file extension
+
+    Returns "pdf", "docx", "doc" (legacy Word, unsupported), "txt" or None.
+    """
+    head = read_head(content)
+    if b"%PDF" in head[:1024]:
+        return "pdf"
+    if head.startswith(ZIP_MAGIC):
+        try:
+            with zipfile.ZipFile(_open_binary(content)) as archive:
+                if "word/document.xml" in archive.namelist():
+                    return "docx"
+        except zipfile.BadZipFile:
+            pass
+        return None
+    if head.startswith(OLE2_MAGIC):
+        return "doc"
+    if head.startswith(b"\xef\xbb\xbf") or _looks_like_text(head):
+        return "txt"
+
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in CONTENT_TYPE_FORMATS:
+        return CONTENT_TYPE_FORMATS[media_type]
+    if name:
+        extension = os.path.splitext(name.split('?')[0])[1].lower()
+        return EXTENSION_FORMATS.get(extension)
+    return None
+
+
+def document_class(fmt: str, size: int) -> str:
+    """Coarse class used to compare engines: format plus a size bucket"""
+    if size < 1024 * 1024:
+        bucket = "small"
+    elif size < 20 * 1024 * 1024:
+        bucket = "medium"
+    else:
+        bucket = "large"
+    return f"{fmt}:{bucket}"
+
+
+def content_size(content: Union[bytes, str]) -> int:
+    return os.path.getsize(content) if isinstance(content, str) else len(content)
+
+
+class Extractor:
+    """A named text-extraction engine for one format
+
+    ``extract_pages(content, start, end)`` returns the text of pages
+    ``[start, end)``; formats without pages return a single page.
+    ``content`` is raw bytes or a file path. Fallback engines are only
+    tried after every primary engine for the format has failed.
+    """
+
+    def __init__(self, name: str, fmt: str, extract_pages: Callable, page_count: Callable = None,
+                 available: bool = True, fallback: bool = False):
+        self.name = name
+        self.format = fmt
+        self.extract_pages = extract_pages
+        self.page_count = page_count or _single_page
+        self.available = available
+        self.fallback = fallback
+
+
+EXTRACTORS: Dict[str, Dict[str, Extractor]] = {}
+
+
+def _single_page(content: Union[bytes, str]) -> int:
+    return 1
+
+
+def register_extractor(extractor: Extractor):
+    EXTRACTORS.setdefault(extractor.format, {})[extractor.name] = extractor
+
+
+def _pypdf2_page_count(content: Union[bytes, str]) -> int:
+    with _open_binary(content) as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def _pypdf2_pages(content: Union[bytes, str], start: int = 0, end: int = None) -> List[str]:
+    with _open_binary(content) as file:
+        pages = PyPDF2.PdfReader(file).pages
+        end = len(pages) if end is None else min(end, len(pages))
+        return [(pages[i].extract_text() or "") for i in range(start, end)]
+
+
+def _open_pymupdf(content: Union[bytes, str]):
+    return fitz.open(content) if isinstance(content, str) else fitz.open(stream=content, filetype="pdf")
+
+
+def _pymupdf_page_count(content: Union[bytes, str]) -> int:
+    with _open_pymupdf(content) as document:
+        return document.page_count
+
+
+def _pymupdf_pages(content: Union[bytes, str], start: int = 0, end: int = None) -> List[str]:
+    with _open_pymupdf(content) as document:
+        end = document.page_count if end is None else min(end, document.page_count)
+        return [document[i].get_text() for i in range(start, end)]
+
+
+def _pdfium_page_count(content: Union[bytes, str]) -> int:
+    document = pypdfium2.PdfDocument(content)
+    try:
+        return len(document)
+    finally:
+        document.close()
+
+
+def _pdfium_pages(content: Union[bytes, str], start: int = 0, end: int = None) -> List[str]:
+    document = pypdfium2.PdfDocument(content)
+    try:
+        end = len(document) if end is None else min(end, len(document))
+        pages = []
+        for i in range(start, end):
+            textpage = document[i].get_textpage()
+            pages.append(textpage.get_text_range())
+            textpage.close()
+        return pages
+    finally:
+        document.close()
+
+
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_BODY = WORD_NAMESPACE + "body"
+W_PARAGRAPH = WORD_NAMESPACE + "p"
+W_RUN = WORD_NAMESPACE + "r"
+W_TEXT = WORD_NAMESPACE + "t"
+W_TAB = WORD_NAMESPACE + "tab"
+W_BREAK = WORD_NAMESPACE + "br"
+W_CARRIAGE_RETURN = WORD_NAMESPACE + "cr"
+W_NO_BREAK_HYPHEN = WORD_NAMESPACE + "noBreakHyphen"
+W_TABLE = WORD_NAMESPACE + "tbl"
+W_ROW = WORD_NAMESPACE + "tr"
+W_CELL = WORD_NAMESPACE + "tc"
+
+
+def _docx_stream_pages(content: Union[bytes, str], start: int = 0, end: int = None) -> List[str]:
+    """Stream-parse ``word/document.xml`` into paragraphs and table rows, in reading order
+
+    Each paragraph becomes a line and each table row one line of cells
+    joined with " | ". Nested tables are flattened into their cell. Finished
+    body elements are dropped as soon as they are read, so memory stays
+    flat however long the document is.
+    """
+    lines = []
+    runs = []        # text pieces of the current paragraph
+    tables = []      # per open table: [row cells, current cell paragraphs]
+    body = None
+    depth = 0        # document = 1, body = 2, top-level blocks = 3
+    run_depth = 0    # tabs and breaks outside runs are tab-stop and layout definitions
+    with zipfile.ZipFile(_open_binary(content)) as archive:
+        with archive.open("word/document.xml") as xml:
+            for event, element in ElementTree.iterparse(xml, events=("start", "end")):
+                tag = element.tag
+                if event == "start":
+                    depth += 1
+                    if tag == W_BODY:
+                        body = element
+                    elif tag == W_RUN:
+                        run_depth += 1
+                    elif tag == W_TABLE:
+                        tables.append([[], []])
+                    elif tag == W_ROW and tables:
+                        tables[-1][0] = []
+                    elif tag == W_CELL and tables:
+                        tables[-1][1] = []
+                    continue
+
+                if tag == W_RUN:
+                    run_depth -= 1
+                elif run_depth:
+                    if tag == W_TEXT:
+                        runs.append(element.text or "")
+                    elif tag == W_TAB:
+                        runs.append("\t")
+                    elif tag in (W_BREAK, W_CARRIAGE_RETURN):
+                        runs.append("\n")
+                    elif tag == W_NO_BREAK_HYPHEN:
+                        runs.append("-")
+                elif tag == W_PARAGRAPH:
+                    text = "".join(runs)
+                    runs = []
+                    if tables:
+                        if text.strip():
+                            tables[-1][1].append(text.strip())
+                    else:
+                        lines.append(text)
+                elif tag == W_CELL and tables:
+                    tables[-1][0].append(" ".join(tables[-1][1]))
+                elif tag == W_ROW and tables:
+                    cells = tables[-1][0]
+                    if any(cells):
+                        row = " | ".join(cells)
+                        if len(tables) > 1:
+                            tables[-2][1].append(row)
+                        else:
+                            lines.append(row)
+                    element.clear()
+                elif tag == W_TABLE and tables:
+                    tables.pop()
+                    if not tables:
+                        lines.append("")
+
+                if depth == 3 and body is not None:
+                    # Later siblings the parser already attached keep being
+                    # filled in through its own references
+                    body.clear()
+                depth -= 1
+    return ["\n".join(lines)]
+
+
+def _docx_pages(content: Union[bytes, str], start: int = 0, end: int = None) -> List[str]:
+    document = docx.Document(content if isinstance(content, str) else BytesIO(content))
+    return ["".join(paragraph.text + "\n" for paragraph in document.paragraphs)]
+
+
+def _text_pages(content: Union[bytes, str], start: int = 0, end: int = None) -> List[str]:
+    if isinstance(content, str):
+        with open(content, 'r', encoding='utf-8-sig') as file:
+            return [file.read()]
+    return [bytes(content).decode('utf-8-sig')]
+
+
+register_extractor(Extractor("pymupdf", "pdf", _pymupdf_pages, _pymupdf_page_count, available=fitz is not None))
+register_extractor(Extractor("pypdfium2", "pdf", _pdfium_pages, _pdfium_page_count, available=pypdfium2 is not None))
+register_extractor(Extractor("pypdf2", "pdf", _pypdf2_pages, _pypdf2_page_count, fallback=True))
+register_extractor(Extractor("docx-stream", "docx", _docx_stream_pages))
+register_extractor(Extractor("python-docx", "docx", _docx_pages, fallback=True))
+register_extractor(Extractor("utf-8", "txt", _text_pages))
+
+
+def available_engines(fmt: str, fallbacks: bool = True) -> List[str]:
+    """Installed engines for a format in configured preference order, fallback engines last"""
+    engines = EXTRACTORS.get(fmt)
+    if not engines:
+        raise Exception(f"Unsupported document format: {fmt or 'unknown'}")
+    order = PDF_EXTRACTION_ENGINES if fmt == "pdf" else []
+    names = [name for name in order if name in engines] + [name for name in engines if name not in order]
+    names = [name for name in names if engines[name].available]
+    primary = [name for name in names if not engines[name].fallback]
+    if not fallbacks:
+        return primary
+    return primary + [name for name in names if engines[name].fallback]
+
+
+def count_pages(content: Union[bytes, str], fmt: str, engines: List[str] = None) -> tuple:
+    """Page count from the first engine that can open the document; returns ``(count, engine)``"""
+    errors = []
+    for name in engines or available_engines(fmt):
+        try:
+            return EXTRACTORS[fmt][name].page_count(content), name
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+    raise Exception(f"Failed to open {fmt} document: {'; '.join(errors) or 'no extraction engine available'}")
+
+
+def extract_pages(content: Union[bytes, str], fmt: str, start: int = 0, end: int = None,
+                  engines: List[str] = None) -> tuple:
+    """Extract pages ``[start, end)`` with the first engine that succeeds
+
+    Picklable entry point for the process pool. Returns ``(pages, engine,
+    seconds)`` so the parent process can keep the timing statistics.
+    """
+    errors = []
+    for name in engines or available_engines(fmt):
+        started = time.perf_counter()
+        try:
+            pages = EXTRACTORS[fmt][name].extract_pages(content, start, end)
+        except Exception as e:
+            print(f"⚠️  {name} failed on {fmt} pages {start}-{end}: {e}")
+            errors.append(f"{name}: {e}")
+            continue
+        return pages, name, time.perf_counter() - started
+    raise Exception(f"Failed to extract {fmt.upper()} text: {'; '.join(errors) or 'no extraction engine available'}")
+
+
+class ExtractionStats:
+    """Per document class and engine extraction timings
+
+    Primary engines are ranked by measured seconds per page once each has
+    ``min_samples`` runs for a document class; until then the configured
+    order applies, with unmeasured engines tried first so they get sampled.
+    Fallback engines always come last.
+    """
+
+    def __init__(self, min_samples: int = EXTRACTION_MIN_SAMPLES):
+        self.min_samples = min_samples
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    def record(self, doc_class: str, engine: str, seconds: float, pages: int, size: int = 0):
+        with self._lock:
+            entry = self.timings.setdefault((doc_class, engine), {"runs": 0, "pages": 0, "seconds": 0.0, "bytes": 0})
+            entry["runs"] += 1
+            entry["pages"] += pages
+            entry["seconds"] += seconds
+            entry["bytes"] += size
+
+    def engine_order(self, fmt: str, doc_class: str) -> List[str]:
+        engines = available_engines(fmt, fallbacks=False)
+        fallbacks = [name for name in available_engines(fmt) if name not in engines]
+        with self._lock:
+            measured = {
+                name: self.timings[(doc_class, name)] for name in engines
+                if self.timings.get((doc_class, name), {}).get("runs", 0) >= self.min_samples
+            }
+        if len(measured) < len(engines):
+            ranked = [name for name in engines if name not in measured] + [name for name in engines if name in measured]
+        else:
+            ranked = sorted(engines, key=lambda name: measured[name]["seconds"] / max(measured[name]["pages"], 1))
+        return ranked + fallbacks
+
+    def summary(self) -> Dict[str, Dict[str, Dict]]:
+        with self._lock:
+            summary = {}
+            for (doc_class, engine), entry in self.timings.items():
+                summary.setdefault(doc_class, {})[engine] = {
+                    "runs": entry["runs"],
+                    "pages": entry["pages"],
+                    "ms_per_page": round(1000 * entry["seconds"] / max(entry["pages"], 1), 2),
+                    "mb_per_second": round(entry["bytes"] / (1024 * 1024) / max(entry["seconds"], 1e-9), 2)
+                }
+            return summary
@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import Column, Float, MetaData, String, Table, Text, delete, func, select
+
+from document_store import DOCUMENT_STORE_URL, make_engine, upsert
+
+load_dotenv()
+
+INGEST_JOB_WORKERS = int(os.getenv("INGEST_JOB_WORKERS", "4"))
+INGEST_JOB_QUEUE_SIZE = int(os.getenv("INGEST_JOB_QUEUE_SIZE", "1000"))
+# Finished jobs kept for polling; the oldest are forgotten first
+INGEST_JOB_RETENTION = int(os.getenv("INGEST_JOB_RETENTION", "1000"))
+# Database for job records, so any worker can answer a poll; set to an empty value to keep jobs in this process only
+INGEST_JOB_URL = os.getenv("INGEST_JOB_URL", DOCUMENT_STORE_URL or "")
+# How often a running job's stage and progress are written to the database
+INGEST_JOB_SYNC_SECONDS = 1.0
+# Finished jobs between sweeps of records beyond the retention limit
+INGEST_JOB_PRUNE_EVERY = 100
+
+
+class SQLJobBackend:
+    """SQLAlchemy table of ingestion job records, one JSON row per job"""
+
+    def __init__(self, url: str = INGEST_JOB_URL):
+        self.engine = make_engine(url)
+
+        metadata = MetaData()
+        self.jobs = Table(
+            "ingest_jobs", metadata,
+            Column("job_id", String(32), primary_key=True),
+            Column("status", String(16), nullable=False, index=True),
+            Column("job", Text, nullable=False),
+            Column("finished", Float, index=True),
+        )
+        metadata.create_all(self.engine)
+
+    def save(self, job: Dict):
+        values = {
+            "status": job["status"],
+            "job": json.dumps(job),
+            "finished": time.time() if job["finished_at"] else None
+        }
+        with self.engine.begin() as conn:
+            upsert(conn, self.jobs, {"job_id": job["job_id"]}, values)
+
+    def load(self, job_id: str) -> Optional[Dict]:
+        with self.engine.connect() as conn:
+            job = conn.execute(select(self.jobs.c.job).where(self.jobs.c.job_id == job_id)).scalar()
+        return json.loads(job) if job else None
+
+    def counts(self) -> Dict[str, int]:
+        with self.engine.connect() as conn:
+            return dict(conn.execute(select(self.jobs.c.status, func.count()).group_by(self.jobs.c.status)).all())
+
+    def prune(self, max_finished: int):
+        """Drop the oldest finished jobs beyond ``max_finished``"""
+        with self.engine.begin() as conn:
+            cutoff = conn.execute(
+                select(self.jobs.c.finished).where(self.jobs.c.finished.isnot(None))
+                .order_by(self.jobs.c.finished.desc()).offset(max_finished).limit(1)
+            ).scalar()
+            if cutoff is not None:
+                conn.execute(delete(self.jobs).where(self.jobs.c.finished <= cutoff))
+
+
+class IngestJobQueue:
+    """Background worker queue for document ingestion, polled by job id
+
+    ``submit`` records a job and queues it without waiting; a fixed set of
+    worker tasks runs jobs in arrival order. Each job's ``run`` coroutine gets
+    the job dict and may update ``stage``/``document_id`` on it while it
+    works. Finished jobs stay visible (bounded by ``max_finished``) so clients
+    can collect the result after completion. With a backend, job records
+    (including ``progress``, when a ``progress`` callback is given) are
+    written to a database shared by all worker processes, so a job can be
+    polled on any worker.
+    """
+
+    def __init__(self, workers: int = INGEST_JOB_WORKERS, max_queued: int = INGEST_JOB_QUEUE_SIZE,
+                 max_finished: int = INGEST_JOB_RETENTION, backend: Optional[SQLJobBackend] = None,
+                 progress: Optional[Callable[[Dict], Optional[Dict]]] = None):
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self.backend = backend
+        self.progress = progress
+        self.jobs = OrderedDict()
+        self.finished = OrderedDict()
+        self._finished_count = 0
+        self._queue = None
+        self._worker_tasks = []
+
+    def __len__(self) -> int:
+        return len(self.jobs)
+
+    def start(self):
+        """Start the worker tasks on the running event loop"""
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel the workers; queued jobs are marked failed and cleaned up"""
+        if self._queue is None:
+            return
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        while not self._queue.empty():
+            job, _, cleanup = self._queue.get_nowait()
+            self._finish(job, error="Server shut down before the job ran", cleanup=cleanup)
+            await self._persist(job)
+        self._worker_tasks = []
+        self._queue = None
+
+    async def submit(self, kind: str, source: str, run: Callable[[Dict], Awaitable[Dict]],
+                     cleanup: Optional[Callable[[], None]] = None) -> Dict:
+        """Queue a job and return its record; raises asyncio.QueueFull when the backlog is full"""
+        self.start()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "kind": kind,
+            "source": source,
+            "status": "queued",
+            "stage": None,
+            "document_id": None,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "started_at": None,
+            "finished_at": None,
+            "progress": None,
+            "result": None,
+            "error": None
+        }
+        if self._queue.full():
+            raise asyncio.QueueFull
+        # Recorded before it can run, so a poll on any worker finds it
+        await self._persist(job)
+        self._queue.put_nowait((job, run, cleanup))
+        self.jobs[job["job_id"]] = job
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        """A job run by this process, else its record in the shared database"""
+        job = self.jobs.get(job_id)
+        if job is None and self.backend is not None:
+            loop = asyncio.get_running_loop()
+            job = await loop.run_in_executor(None, self.backend.load, job_id)
+        return job
+
+    async def counts(self) -> Dict[str, int]:
+        counts = {"queued": 0, "running": 0, "completed": 0, "failed": 0}
+        if self.backend is not None:
+            loop = asyncio.get_running_loop()
+            try:
+                counts.update(await loop.run_in_executor(None, self.backend.counts))
+                return counts
+            except Exception as e:
+                print(f"⚠️  Failed to count ingestion jobs: {e}")
+        for job in self.jobs.values():
+            counts[job["status"]] += 1
+        return counts
+
+    def _store(self, job: Dict):
+        try:
+            self.backend.save(dict(job))
+            if job["finished_at"] is not None:
+                self._finished_count += 1
+                if self._finished_count % INGEST_JOB_PRUNE_EVERY == 0:
+                    self.backend.prune(self.max_finished)
+        except Exception as e:
+            print(f"⚠️  Failed to save job {job['job_id']}: {e}")
+
+    async def _persist(self, job: Dict):
+        if self.backend is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._store, job)
+
+    async def _sync(self, job: Dict, done: asyncio.Event):
+        """Publish a running job's stage and progress until ``done`` is set"""
+        while not done.is_set():
+            try:
+                await asyncio.wait_for(done.wait(), INGEST_JOB_SYNC_SECONDS)
+            except asyncio.TimeoutError:
+                if self.progress is not None:
+                    job["progress"] = self.progress(job)
+                await self._persist(job)
+
+    def _finish(self, job: Dict, result: Dict = None, error: str = None, cleanup: Callable[[], None] = None):
+        if cleanup is not None:
+            try:
+                cleanup()
+            except Exception as e:
+                print(f"⚠️  Failed to clean up job {job['job_id']}: {e}")
+        job["result"] = result
+        job["error"] = error
+        job["status"] = "failed" if error else "completed"
+        if not error:
+            job["stage"] = None
+        job["finished_at"] = datetime.now().isoformat(timespec="seconds")
+
+        self.finished[job["job_id"]] = None
+        while len(self.finished) > self.max_finished:
+            expired, _ = self.finished.popitem(last=False)
+            self.jobs.pop(expired, None)
+
+    async def _worker(self):
+        while True:
+            job, run, cleanup = await self._queue.get()
+            job["status"] = "running"
+            job["started_at"] = datetime.now().isoformat(timespec="seconds")
+            done = asyncio.Event()
+            sync_task = None
+            try:
+                await self._persist(job)
+                if self.backend is not None:
+                    sync_task = asyncio.create_task(self._sync(job, done))
+                result = await run(job)
+                if result.get("success", True):
+                    self._finish(job, result=result, cleanup=cleanup)
+                else:
+                    self._finish(job, result=result, error=result.get("error") or "Job failed", cleanup=cleanup)
+            except asyncio.CancelledError:
+                if sync_task is not None:
+                    sync_task.cancel()
+                self._finish(job, error="Server shut down while the job was running", cleanup=cleanup)
+                if self.backend is not None:
+                    self._store(job)
+                self._queue.task_done()
+                raise
+            except Exception as e:
+                self._finish(job, error=str(e), cleanup=cleanup)
+
+            # Let an in-flight progress write land before the final record
+            done.set()
+            if sync_task is not None:
+                await sync_task
+            await self._persist(job)
+            self._queue.task_done()
@@ -1,15 +1,30 @@
-from fastapi import FastAPI, HTTPException, Depends, status, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Depends, Request, status, UploadFile, File, Form
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 import os
+import time
+import asyncio
 from dotenv import load_dotenv
 
-from simple_processor import SimpleDocumentProcessor
+from simple_processor import ANSWER_BATCH_SIZE, SimpleDocumentProcessor
+from downloader import DOWNLOAD_MAX_BYTES, SpooledDocument
+from shared_index import SHARED_INDEX_DIR, SharedIndexStore
+from query_log import QUERY_LOG_URL, QueryLog, SQLQueryBackend
+from ingest_jobs import INGEST_JOB_URL, IngestJobQueue, SQLJobBackend
+from answer_cache import ANSWER_CACHE_URL, AnswerCache, SemanticAnswerCache, SQLAnswerBackend
+from document_store import DOCUMENT_STORE_URL, DocumentStore, SQLDocumentBackend, SingleFlight, normalize_document_url
 
 load_dotenv()
 
+# Uploads larger than this are rejected with 413, before or while they are read
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(DOWNLOAD_MAX_BYTES)))
+UPLOAD_READ_BYTES = 1024 * 1024
+# Most documents accepted by one bulk ingestion request
+BULK_MAX_DOCUMENTS = int(os.getenv("BULK_MAX_DOCUMENTS", "500"))
+
 app = FastAPI(
     title="HackRx 6.0 Document Intelligence Agent - Final Version",
     description="AI-powered document analysis system for HackRx 6.0 competition",
@@ -25,6 +40,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """Reject oversized uploads from their Content-Length, before the multipart body is parsed"""
+    if request.url.path == "/documents/upload-file":
+        length = request.headers.get("content-length")
+        if length and length.isdigit() and int(length) > UPLOAD_MAX_BYTES:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"Upload exceeds the {UPLOAD_MAX_BYTES} byte limit"}
+            )
+    return await call_next(request)
+
 # Security
 security = HTTPBearer()
 BEARER_TOKEN = os.getenv("BEARER_TOKEN")
@@ -38,12 +65,236 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
         )
     return credentials.credentials
 
-# Initialize document processor
-doc_processor = SimpleDocumentProcessor()
+# Services are built by build_services() on startup, not at import: the
+# spawn-based extraction pool re-imports the main module in every worker
+# process, and those workers must not open the store, the query log or the
+# shared index again
+document_backend: Optional[SQLDocumentBackend] = None
+shared_index: Optional[SharedIndexStore] = None
+answer_cache: Optional[AnswerCache] = None
+semantic_cache: Optional[SemanticAnswerCache] = None
+doc_processor: Optional[SimpleDocumentProcessor] = None
+documents_storage: Optional[DocumentStore] = None
+queries_storage: Optional[QueryLog] = None
+ingest_jobs: Optional[IngestJobQueue] = None
+
+def build_services():
+    """Open the persistent stores and caches and create the document processor (once per process)"""
+    global document_backend, shared_index, answer_cache, semantic_cache, doc_processor, documents_storage, queries_storage, ingest_jobs
+    if doc_processor is not None:
+        return
+
+    # Persistent store for warm restarts: metadata is read now, chunks and indexes on first use
+    document_backend = SQLDocumentBackend(DOCUMENT_STORE_URL) if DOCUMENT_STORE_URL else None
+
+    # Memory-mapped chunk/index files shared by all uvicorn workers on this box
+    shared_index = SharedIndexStore(SHARED_INDEX_DIR) if SHARED_INDEX_DIR else None
+
+    # Repeated questions over the same document and retrieval skip Gemini; the disk tier survives restarts
+    answer_cache = AnswerCache(backend=SQLAnswerBackend(ANSWER_CACHE_URL) if ANSWER_CACHE_URL else None)
+
+    # Paraphrases of an answered question (same document, same numbers, overlapping retrieval) reuse its answer
+    semantic_cache = SemanticAnswerCache()
+
+    # Initialize document processor
+    doc_processor = SimpleDocumentProcessor(backing_store=document_backend, shared_index=shared_index,
+                                            answer_cache=answer_cache, semantic_cache=semantic_cache)
+
+    # In-memory storage: documents are keyed by content hash, URLs resolve through aliases
+    documents_storage = DocumentStore(backend=document_backend, executor=doc_processor.io_executor)
+    if documents_storage:
+        print(f"📦 Restored {len(documents_storage)} documents from the persistent store")
+
+    # Keep the registry consistent with the processor's memory-bounded document cache
+    doc_processor.eviction_listeners.append(documents_storage.evict)
+
+    # Bounded query history in the shared database, so every worker lists the same queries
+    queries_storage = QueryLog(backend=SQLQueryBackend(QUERY_LOG_URL) if QUERY_LOG_URL else None)
+
+    # Background ingestion jobs for clients that should not hold the connection open; job
+    # records and progress go to the shared database so a poll can land on any worker
+    ingest_jobs = IngestJobQueue(
+        backend=SQLJobBackend(INGEST_JOB_URL) if INGEST_JOB_URL else None,
+        progress=lambda job: doc_processor.ingest_progress(job["document_id"]) if job["document_id"] else None
+    )
+
+# Concurrent ingests of the same document share one in-flight processing task
+document_ingests = SingleFlight()
+
+async def ingest_document_url(url: str, title: str, status: Dict = None) -> Dict:
+    """Process a document URL once, coalescing concurrent requests for the same document"""
+    async def ingest() -> Dict:
+        result = await doc_processor.aprocess_document(url, status=status)
+        if result["success"]:
+            await documents_storage.aadd(result["document_id"], {
+                "title": title,
+                "content": result["text"][:5000],  # Store sample content
+                "chunks": result["chunks"],
+                "url": url
+            }, url=url)
+        return result
+
+    return await document_ingests.do(normalize_document_url(url), ingest)
+
+async def spool_upload(file: UploadFile, suffix: str = "") -> SpooledDocument:
+    """Copy an upload into a SpooledDocument block by block, hashing it on the way
+
+    Small files stay in memory, large ones land in a temp file; the size cap
+    is enforced as the blocks arrive, so an oversized body is never kept whole.
+    """
+    if file.size is not None and file.size > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds the {UPLOAD_MAX_BYTES} byte limit")
+    spooled = SpooledDocument(suffix=suffix)
+    try:
+        while True:
+            block = await file.read(UPLOAD_READ_BYTES)
+            if not block:
+                break
+            if spooled.size + len(block) > UPLOAD_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Upload exceeds the {UPLOAD_MAX_BYTES} byte limit")
+            spooled.write(block)
+    except BaseException:
+        spooled.close()
+        raise
+    spooled.content_type = file.content_type
+    return spooled.finish()
+
+async def ingest_uploaded_file(file_content: Union[bytes, str], filename: str, title: str, document_id: str,
+                               status: Dict = None) -> Dict:
+    """Process an upload (bytes or a spool file path) once, coalescing concurrent uploads of the same content"""
+    async def ingest() -> Dict:
+        result = await doc_processor.aprocess_document(
+            source=filename,
+            is_file_path=False,
+            file_content=file_content,
+            filename=filename,
+            document_id=document_id,
+            status=status
+        )
+        if result["success"]:
+            await documents_storage.aadd(result["document_id"], {
+                "title": title,
+                "content": result["text"][:5000],
+                "chunks": result["chunks"],
+                "filename": filename
+            })
+        return result
 
-# In-memory storage
-documents_storage = {}
-queries_storage = []
+    return await document_ingests.do(document_id, ingest)
+
+async def ingest_bulk(items: List[Dict]) -> Dict:
+    """Ingest many documents at once, pipelined through the processor's download/extract/index stages
+
+    Every item starts immediately; ``doc_processor.stage_slots`` bounds how
+    many sit in each stage, so downloads overlap extraction and indexing.
+    Items are dicts with ``url`` (and ``title``) or with an uploaded ``spool``
+    and ``filename``; spools are closed as soon as their item finishes.
+    """
+    started = time.perf_counter()
+
+    async def run(item: Dict) -> Dict:
+        item_started = time.perf_counter()
+        source = item.get("url") or item.get("filename")
+        try:
+            spool = item.get("spool")
+            document_id = spool.sha256 if spool is not None else await documents_storage.aresolve_url(item["url"])
+            doc_info = await documents_storage.aget(document_id) if document_id is not None else None
+            if doc_info is not None:
+                result = {
+                    "success": True,
+                    "cached": True,
+                    "document_id": document_id,
+                    "chunks": doc_info["chunks"]
+                }
+            elif spool is not None:
+                result = await ingest_uploaded_file(spool.content, item["filename"], item.get("title") or item["filename"], document_id)
+            else:
+                result = await ingest_document_url(item["url"], item.get("title") or source.split('?')[0].split('/')[-1])
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        finally:
+            if item.get("spool") is not None:
+                item["spool"].close()
+
+        entry = {
+            "source": source,
+            "status": "failed" if not result["success"] else "cached" if result.get("cached") else "processed",
+            "document_id": result.get("document_id"),
+            "chunks": result.get("chunks", 0),
+            "pages": result.get("pages", 0),
+            "seconds": round(time.perf_counter() - item_started, 3),
+            "timings": {stage: round(seconds, 3) for stage, seconds in result.get("timings", {}).items()}
+        }
+        if not result["success"]:
+            entry["error"] = result["error"]
+        return entry
+
+    results = await asyncio.gather(*(run(item) for item in items))
+    elapsed = time.perf_counter() - started
+
+    stage_seconds = {}
+    for entry in results:
+        for stage, seconds in entry["timings"].items():
+            stage_seconds[stage] = round(stage_seconds.get(stage, 0) + seconds, 3)
+    pages = sum(entry["pages"] for entry in results)
+    chunks = sum(entry["chunks"] for entry in results if entry["status"] == "processed")
+    summary = {
+        "total": len(results),
+        "processed": sum(entry["status"] == "processed" for entry in results),
+        "cached": sum(entry["status"] == "cached" for entry in results),
+        "failed": sum(entry["status"] == "failed" for entry in results),
+        "seconds": round(elapsed, 3),
+        "documents_per_second": round(len(results) / elapsed, 2) if elapsed else None,
+        "pages_per_second": round(pages / elapsed, 2) if elapsed else None,
+        "chunks_per_second": round(chunks / elapsed, 2) if elapsed else None,
+        "stage_seconds": stage_seconds
+    }
+    print(f"📚 Bulk ingest: {summary['processed']} processed, {summary['cached']} cached, "
+          f"{summary['failed']} failed in {elapsed:.1f}s")
+    return {"success": summary["failed"] == 0, "summary": summary, "documents": results}
+
+def job_result(result: Dict) -> Dict:
+    """The part of an ingest result worth keeping on a job record (no document text)"""
+    return {
+        "success": result["success"],
+        "cached": result.get("cached", False),
+        "document_id": result.get("document_id"),
+        "chunks": result.get("chunks", 0),
+        "pages": result.get("pages"),
+        "timings": {stage: round(seconds, 3) for stage, seconds in result.get("timings", {}).items()},
+        "error": result.get("error")
+    }
+
+async def submit_ingest_job(kind: str, source: str, ingest, cleanup=None) -> JSONResponse:
+    """Queue an ingest coroutine as a background job and answer 202 with its polling URL"""
+    async def run(job: Dict) -> Dict:
+        return job_result(await ingest(job))
+
+    try:
+        job = await ingest_jobs.submit(kind, source, run, cleanup=cleanup)
+    except asyncio.QueueFull:
+        if cleanup is not None:
+            cleanup()
+        raise HTTPException(status_code=503, detail="Ingestion queue is full, retry later")
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        "message": "Document queued for processing",
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "status_url": f"/jobs/{job['job_id']}"
+    })
+
+@app.on_event("startup")
+async def start_background_writers():
+    build_services()
+    await queries_storage.start()
+    ingest_jobs.start()
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    await ingest_jobs.stop()
+    await queries_storage.stop()
+    await doc_processor.aclose()
 
 # Pydantic models
 class HackRxRequest(BaseModel):
@@ -53,6 +304,13 @@ class HackRxRequest(BaseModel):
 class HackRxResponse(BaseModel):
     answers: List[str]
 
+class BulkDocument(BaseModel):
+    url: str
+    title: Optional[str] = None
+
+class BulkIngestRequest(BaseModel):
+    documents: List[Union[str, BulkDocument]]
+
 @app.get("/")
 async def root():
     return {
@@ -72,8 +330,12 @@ async def root():
             "hackrx": "/hackrx/run",
             "upload": "/documents/upload-file",
             "upload-url": "/documents/upload-url",
+            "bulk": "/documents/bulk",
+            "bulk-upload": "/documents/bulk-upload",
+            "jobs": "/jobs/{job_id}",
             "test": "/test-upload",
             "query": "/query",
+            "queries": "/documents/{document_id}/queries",
             "docs": "/docs"
         }
     }
@@ -84,7 +346,7 @@ async def health_check():
         "status": "healthy", 
         "service": "hackrx-document-agent", 
         "version": "3.0.0",
-        "ai_models": ["Gemini-2.0-Flash", "Simple-Text-Similarity"],
+        "ai_models": ["Gemini-2.0-Flash", "BM25-Retrieval"],
         "ready_for": "HackRx 6.0 Submission"
     }
 
@@ -109,10 +371,11 @@ async def hackrx_run(
     try:
         print(f"🔄 Processing HackRx request for document: {request.documents[:50]}...")
         
-        # Check if document is already processed
-        if request.documents not in documents_storage:
+        # Check if document is already processed (volatile query params such as SAS tokens are ignored)
+        document_id = await documents_storage.aresolve_url(request.documents)
+        if document_id is None:
             print(f"📄 Processing new document...")
-            result = doc_processor.process_document(request.documents)
+            result = await ingest_document_url(request.documents, request.documents.split('?')[0].split('/')[-1])
             
             if not result["success"]:
                 raise HTTPException(
@@ -120,37 +383,36 @@ async def hackrx_run(
                     detail=f"Document processing failed: {result['error']}"
                 )
             
-            # Store document in memory
-            documents_storage[request.documents] = {
-                "title": request.documents.split('/')[-1],
-                "content": result["text"][:5000],  # Store sample content
-                "chunks": result["chunks"],
-                "document_id": result["document_id"]
-            }
             document_id = result["document_id"]
-            print(f"✅ Document processed: {result['chunks']} chunks created")
+            if result.get("cached"):
+                print(f"♻️  Same content already processed under another URL")
+            else:
+                print(f"✅ Document processed: {result['chunks']} chunks created")
         else:
-            document_id = documents_storage[request.documents]["document_id"]
             print(f"♻️  Using cached document")
         
-        # Process each question with AI reasoning
+        # Retrieve chunks for every question in one batched pass
+        chunk_lists = await doc_processor.asearch_similar_chunks_batch(
+            queries=request.questions,
+            document_id=document_id,
+            top_k=5
+        )
+        
+        # Generate answers for all questions concurrently (order is preserved); with
+        # ANSWER_BATCH_SIZE > 1 several questions share one prompt and one Gemini call
+        print(f"🤔 Generating answers for {len(request.questions)} questions...")
+        if ANSWER_BATCH_SIZE > 1:
+            results = await doc_processor.agenerate_answers_batched(request.questions, chunk_lists)
+        else:
+            results = await doc_processor.agenerate_answers(request.questions, chunk_lists)
+        
         answers = []
-        for i, question in enumerate(request.questions):
-            print(f"🤔 Processing question {i+1}/{len(request.questions)}: {question[:80]}...")
-            
-            # Search for relevant chunks
-            relevant_chunks = doc_processor.search_similar_chunks(
-                query=question,
-                document_id=document_id,
-                top_k=5
-            )
-            
-            # Generate answer using AI
-            result = doc_processor.generate_answer(question, relevant_chunks)
+        for question, result in zip(request.questions, results):
             answer = result["answer"]
             
             # Store query for analytics
-            queries_storage.append({
+            queries_storage.record({
+                "document_id": document_id,
                 "document_url": request.documents,
                 "question": question,
                 "answer": answer,
@@ -159,7 +421,6 @@ async def hackrx_run(
             })
             
             answers.append(answer)
-            print(f"✅ Answer generated with {len(relevant_chunks)} relevant chunks")
         
         print(f"🎉 HackRx request completed successfully! Generated {len(answers)} answers.")
         return HackRxResponse(answers=answers)
@@ -172,9 +433,14 @@ async def hackrx_run(
 async def upload_file(
     file: UploadFile = File(...),
     title: str = Form(""),
+    background: bool = False,
     token: str = Depends(verify_token)
 ):
-    """📁 Upload and process document files (PDF, DOCX, TXT)"""
+    """📁 Upload and process document files (PDF, DOCX, TXT)
+
+    With ``?background=true`` the upload is queued as an ingestion job and
+    the response is 202 with a job id to poll at ``/jobs/{job_id}``.
+    """
     try:
         if not file.filename:
             raise HTTPException(status_code=400, detail="No filename provided")
@@ -186,26 +452,35 @@ async def upload_file(
                 detail="Unsupported file type. Please upload PDF, DOCX, or TXT files."
             )
         
-        # Read file content
-        file_content = await file.read()
-        file_identifier = f"file_{file.filename}_{len(file_content)}"
-        
-        # Check if already processed
-        if file_identifier in documents_storage:
-            return {
-                "success": True,
-                "message": "Document already processed",
-                "document_id": documents_storage[file_identifier]["document_id"],
-                "chunks": documents_storage[file_identifier]["chunks"]
-            }
-        
-        # Process document
-        result = doc_processor.process_document(
-            source=file.filename,
-            is_file_path=False,
-            file_content=file_content,
-            filename=file.filename
-        )
+        # Stream the upload into memory or a spool file, hashing it as it is read
+        spooled = await spool_upload(file, suffix=f".{file_ext}")
+        queued = False
+        try:
+            file_identifier = spooled.sha256
+            
+            # Check if already processed
+            doc_info = await documents_storage.aget(file_identifier)
+            if doc_info is not None:
+                return {
+                    "success": True,
+                    "message": "Document already processed",
+                    "document_id": file_identifier,
+                    "chunks": doc_info["chunks"]
+                }
+            
+            filename = file.filename
+            if background:
+                # The job owns the spool from here and closes it when it finishes
+                queued = True
+                return await submit_ingest_job("upload", filename, lambda job: ingest_uploaded_file(
+                    spooled.content, filename, title or filename, file_identifier, status=job
+                ), cleanup=spooled.close)
+            
+            # Process document and store it in memory; large uploads reach the extractors as a path
+            result = await ingest_uploaded_file(spooled.content, filename, title or filename, file_identifier)
+        finally:
+            if not queued:
+                spooled.close()
         
         if not result["success"]:
             return {
@@ -214,15 +489,6 @@ async def upload_file(
                 "error": result["error"]
             }
         
-        # Store in memory
-        documents_storage[file_identifier] = {
-            "title": title or file.filename,
-            "content": result["text"][:5000],
-            "chunks": result["chunks"],
-            "document_id": result["document_id"],
-            "filename": file.filename
-        }
-        
         return {
             "success": True,
             "message": "Document processed successfully",
@@ -230,6 +496,14 @@ async def upload_file(
             "chunks": result["chunks"]
         }
     
+    except HTTPException as e:
+        if e.status_code in (413, 503):
+            raise
+        return {
+            "success": False,
+            "message": "File upload failed",
+            "error": str(e.detail)
+        }
     except Exception as e:
         return {
             "success": False,
@@ -240,9 +514,14 @@ async def upload_file(
 @app.post("/documents/upload-url")
 async def upload_url(
     request: dict,
+    background: bool = False,
     token: str = Depends(verify_token)
 ):
-    """🔗 Upload and process document from URL"""
+    """🔗 Upload and process document from URL
+
+    With ``?background=true`` the document is queued as an ingestion job and
+    the response is 202 with a job id to poll at ``/jobs/{job_id}``.
+    """
     try:
         url = request.get("url")
         title = request.get("title", "")
@@ -251,19 +530,23 @@ async def upload_url(
             raise HTTPException(status_code=400, detail="URL is required")
         
         # Check if already processed
-        if url in documents_storage:
+        document_id = await documents_storage.aresolve_url(url)
+        doc_info = await documents_storage.aget(document_id) if document_id is not None else None
+        if doc_info is not None:
             return {
                 "success": True,
                 "message": "Document already processed",
-                "document_id": documents_storage[url]["document_id"],
-                "chunks": documents_storage[url]["chunks"]
+                "document_id": document_id,
+                "chunks": doc_info["chunks"]
             }
         
-        # Process document from URL
-        result = doc_processor.process_document(
-            source=url,
-            is_file_path=False
-        )
+        if background:
+            return await submit_ingest_job("url", url, lambda job: ingest_document_url(
+                url, title or f"Document from URL", status=job
+            ))
+        
+        # Process document from URL and store it in memory
+        result = await ingest_document_url(url, title or f"Document from URL")
         
         if not result["success"]:
             return {
@@ -272,15 +555,6 @@ async def upload_url(
                 "error": result["error"]
             }
         
-        # Store in memory
-        documents_storage[url] = {
-            "title": title or f"Document from URL",
-            "content": result["text"][:5000],
-            "chunks": result["chunks"],
-            "document_id": result["document_id"],
-            "url": url
-        }
-        
         return {
             "success": True,
             "message": "Document processed successfully from URL",
@@ -288,6 +562,14 @@ async def upload_url(
             "chunks": result["chunks"]
         }
     
+    except HTTPException as e:
+        if e.status_code == 503:
+            raise
+        return {
+            "success": False,
+            "message": "URL upload failed",
+            "error": str(e.detail)
+        }
     except Exception as e:
         return {
             "success": False,
@@ -295,6 +577,75 @@ async def upload_url(
             "error": str(e)
         }
 
+@app.post("/documents/bulk")
+async def bulk_ingest_urls(
+    request: BulkIngestRequest,
+    token: str = Depends(verify_token)
+):
+    """📚 Ingest a list of document URLs through the staged download → extract → index pipeline"""
+    if not request.documents:
+        raise HTTPException(status_code=400, detail="At least one document is required")
+    if len(request.documents) > BULK_MAX_DOCUMENTS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_DOCUMENTS} documents per request")
+
+    items = [
+        {"url": document} if isinstance(document, str) else {"url": document.url, "title": document.title}
+        for document in request.documents
+    ]
+    return await ingest_bulk(items)
+
+@app.post("/documents/bulk-upload")
+async def bulk_ingest_files(
+    files: List[UploadFile] = File(...),
+    token: str = Depends(verify_token)
+):
+    """📚 Ingest several uploaded files (PDF, DOCX, TXT) through the staged pipeline"""
+    if len(files) > BULK_MAX_DOCUMENTS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_DOCUMENTS} documents per request")
+
+    items = []
+    try:
+        for file in files:
+            filename = file.filename or "upload"
+            items.append({
+                "filename": filename,
+                "spool": await spool_upload(file, suffix=os.path.splitext(filename)[1])
+            })
+    except BaseException:
+        for item in items:
+            item["spool"].close()
+        raise
+    return await ingest_bulk(items)
+
+@app.get("/jobs/{job_id}")
+async def get_ingest_job(
+    job_id: str,
+    token: str = Depends(verify_token)
+):
+    """⏳ Status and progress of a background ingestion job"""
+    job = await ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    response = dict(job)
+    result = job["result"]
+    if result is not None:
+        response["progress"] = {
+            "pages_extracted": result.get("pages"),
+            "chunks_indexed": result.get("chunks"),
+            "complete": job["status"] == "completed"
+        }
+    else:
+        # Jobs running on another worker report the progress it last stored
+        progress = doc_processor.ingest_progress(job["document_id"]) if job["document_id"] else None
+        response["progress"] = progress or job.get("progress") or {
+            "pages_extracted": 0,
+            "total_pages": None,
+            "chunks_indexed": 0,
+            "complete": False
+        }
+    return response
+
 @app.post("/query")
 async def query_document(
     request: dict,
@@ -313,41 +664,50 @@ async def query_document(
         doc_info = None
         target_doc_id = None
         
-        if document_url and document_url in documents_storage:
-            doc_info = documents_storage[document_url]
-            target_doc_id = doc_info["document_id"]
-        elif document_id:
-            for key, value in documents_storage.items():
-                if value["document_id"] == document_id:
-                    doc_info = value
-                    target_doc_id = document_id
-                    break
+        if document_url:
+            target_doc_id = await documents_storage.aresolve_url(document_url)
+        if target_doc_id is None and document_id:
+            target_doc_id = document_id
+        if target_doc_id is not None:
+            doc_info = await documents_storage.aget(target_doc_id)
+        
+        # A document still being ingested can be queried over its indexed prefix
+        ingest_progress = None
+        if not doc_info and document_id:
+            ingest_progress = doc_processor.ingest_progress(document_id)
+            if ingest_progress is not None:
+                target_doc_id = document_id
+                doc_info = {"title": "Document being processed"}
         
         if not doc_info:
             raise HTTPException(status_code=404, detail="Document not found")
         
         # Search and generate answer
-        relevant_chunks = doc_processor.search_similar_chunks(
+        relevant_chunks = await doc_processor.asearch_similar_chunks(
             query=question,
             document_id=target_doc_id,
             top_k=5
         )
         
-        result = doc_processor.generate_answer(question, relevant_chunks)
+        result = await doc_processor.agenerate_answer(question, relevant_chunks)
         
         # Store query
-        queries_storage.append({
+        queries_storage.record({
             "document_id": target_doc_id,
             "question": question,
             "answer": result["answer"],
-            "relevant_chunks": len(result["relevant_chunks"])
+            "relevant_chunks": len(result["relevant_chunks"]),
+            "reasoning": result.get("reasoning", "")
         })
         
         return {
             "answer": result["answer"],
             "relevant_chunks": result["relevant_chunks"],
             "reasoning": result.get("reasoning", ""),
-            "document_title": doc_info["title"]
+            "document_title": doc_info["title"],
+            "cached": result.get("cached", False),
+            "partial": ingest_progress is not None,
+            "ingest_progress": ingest_progress
         }
     
     except Exception as e:
@@ -357,29 +717,42 @@ async def query_document(
 async def list_documents(token: str = Depends(verify_token)):
     """📚 List all processed documents"""
     documents = []
-    for key, doc in documents_storage.items():
+    for doc in await documents_storage.avalues():
         documents.append({
-            "id": key,
-            "url": key if key.startswith("http") else None,
+            "id": doc["document_id"],
+            "url": doc.get("url"),
             "title": doc["title"],
             "chunks": doc["chunks"],
             "document_id": doc["document_id"],
-            "is_file_upload": not key.startswith("http"),
+            "is_file_upload": not doc.get("url"),
             "content_preview": doc["content"][:200] + "..." if len(doc["content"]) > 200 else doc["content"]
         })
     return documents
 
+@app.get("/documents/{document_id}/queries")
+async def list_document_queries(document_id: str, limit: int = 50, token: str = Depends(verify_token)):
+    """🗂️ Recent queries for one document (oldest first)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(doc_processor.io_executor, queries_storage.for_document, document_id, limit)
+
+@app.get("/queries/recent")
+async def list_recent_queries(limit: int = 50, token: str = Depends(verify_token)):
+    """🕑 Most recent queries across all documents (oldest first)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(doc_processor.io_executor, queries_storage.latest, limit)
+
 @app.get("/stats")
 async def get_stats(token: str = Depends(verify_token)):
     """📊 System statistics and performance metrics"""
-    total_docs = len(documents_storage)
-    total_queries = len(queries_storage)
+    documents = await documents_storage.avalues()
+    total_docs = len(documents)
+    total_queries = await asyncio.get_running_loop().run_in_executor(doc_processor.io_executor, len, queries_storage)
     
-    file_uploads = sum(1 for key in documents_storage.keys() if not key.startswith("http"))
+    file_uploads = sum(1 for doc in documents if not doc.get("url"))
     url_documents = total_docs - file_uploads
     
     # Calculate average chunks per document
-    total_chunks = sum(doc["chunks"] for doc in documents_storage.values())
+    total_chunks = sum(doc["chunks"] for doc in documents)
     avg_chunks = total_chunks / max(total_docs, 1)
     
     return {
@@ -390,8 +763,15 @@ async def get_stats(token: str = Depends(verify_token)):
         "total_chunks": total_chunks,
         "avg_chunks_per_doc": round(avg_chunks, 1),
         "avg_queries_per_doc": round(total_queries / max(total_docs, 1), 2),
+        "documents_in_memory": len(doc_processor.document_sizes),
+        "document_cache_mb": round(doc_processor.cache_bytes / (1024 * 1024), 2),
+        "document_cache_limit_mb": round(doc_processor.cache_max_bytes / (1024 * 1024), 2),
+        "extraction_engines": doc_processor.extraction_stats.summary(),
+        "ingest_jobs": await ingest_jobs.counts(),
+        "answer_cache": answer_cache.stats(),
+        "semantic_cache": semantic_cache.stats(),
         "system_status": "Operational",
-        "ai_models": ["Gemini-2.0-Flash-Exp", "Simple-Text-Similarity"],
+        "ai_models": ["Gemini-2.0-Flash-Exp", "BM25-Retrieval"],
         "compliance": "HackRx 6.0 Ready"
     }
 
@@ -431,9 +811,12 @@ if __name__ == "__main__":
     import uvicorn
     print("🚀 Starting HackRx 6.0 Document Intelligence Agent...")
     print("🎯 Ready for competition submission!")
+    workers = int(os.getenv("API_WORKERS", 1))
     uvicorn.run(
         "main_final:app",
         host=os.getenv("API_HOST", "0.0.0.0"),
         port=int(os.getenv("API_PORT", 8000)),
-        reload=True
+        # Workers share documents through the persistent store and the shared index
+        workers=workers,
+        reload=workers == 1
     )
@@ -0,0 +1,195 @@
+import os
+import json
+import asyncio
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import Column, Integer, MetaData, String, Table, Text, delete, func, insert, select
+
+from document_store import DOCUMENT_STORE_URL, make_engine
+
+load_dotenv()
+
+# Database for the query history, shared by every worker; set to an empty value to keep it in memory only
+QUERY_LOG_URL = os.getenv("QUERY_LOG_URL", DOCUMENT_STORE_URL or "")
+# Most queries kept in the database; the oldest are pruned first
+QUERY_LOG_MAX_ENTRIES = int(os.getenv("QUERY_LOG_MAX_ENTRIES", "100000"))
+# In-memory mode only: size of the recent ring and of each document's ring
+QUERY_LOG_RECENT = int(os.getenv("QUERY_LOG_RECENT", "1000"))
+QUERY_LOG_PER_DOCUMENT = int(os.getenv("QUERY_LOG_PER_DOCUMENT", "50"))
+QUERY_LOG_MAX_DOCUMENTS = int(os.getenv("QUERY_LOG_MAX_DOCUMENTS", "10000"))
+QUERY_LOG_QUEUE_SIZE = 10000
+QUERY_LOG_BATCH_SIZE = 500
+# Batches written between sweeps of rows beyond QUERY_LOG_MAX_ENTRIES
+QUERY_LOG_PRUNE_EVERY = 20
+
+
+class SQLQueryBackend:
+    """SQLAlchemy table of logged queries, one JSON row each, indexed by document"""
+
+    def __init__(self, url: str = QUERY_LOG_URL, max_entries: int = QUERY_LOG_MAX_ENTRIES):
+        self.engine = make_engine(url)
+        self.max_entries = max_entries
+
+        metadata = MetaData()
+        self.queries = Table(
+            "query_log", metadata,
+            Column("id", Integer, primary_key=True, autoincrement=True),
+            Column("document_id", String(64), index=True),
+            Column("entry", Text, nullable=False),
+        )
+        metadata.create_all(self.engine)
+
+    def save_many(self, entries: List[Dict]):
+        with self.engine.begin() as conn:
+            conn.execute(insert(self.queries), [
+                {"document_id": entry.get("document_id"), "entry": json.dumps(entry, ensure_ascii=False)}
+                for entry in entries
+            ])
+
+    def _latest(self, query, limit: Optional[int]) -> List[Dict]:
+        query = query.order_by(self.queries.c.id.desc())
+        if limit:
+            query = query.limit(limit)
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).scalars().all()
+        return [json.loads(row) for row in reversed(rows)]
+
+    def for_document(self, document_id: str, limit: int = None) -> List[Dict]:
+        return self._latest(select(self.queries.c.entry).where(self.queries.c.document_id == document_id), limit)
+
+    def latest(self, limit: int = 50) -> List[Dict]:
+        return self._latest(select(self.queries.c.entry), limit)
+
+    def count(self) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(self.queries)).scalar()
+
+    def prune(self):
+        """Drop the oldest rows beyond ``max_entries``"""
+        with self.engine.begin() as conn:
+            cutoff = conn.execute(
+                select(self.queries.c.id).order_by(self.queries.c.id.desc()).offset(self.max_entries).limit(1)
+            ).scalar()
+            if cutoff is not None:
+                conn.execute(delete(self.queries).where(self.queries.c.id <= cutoff))
+
+
+class QueryLog:
+    """Bounded query history, kept in a database table shared by all worker processes
+
+    ``record`` is non-blocking: entries are queued for a background task that
+    inserts them in batches on a worker thread. Reads go to the table, so
+    every worker lists the same history. Without a backend the history lives
+    in a ring buffer plus a small per-document ring in this process.
+    """
+
+    def __init__(self, backend: Optional[SQLQueryBackend] = None, max_recent: int = QUERY_LOG_RECENT,
+                 max_per_document: int = QUERY_LOG_PER_DOCUMENT, max_documents: int = QUERY_LOG_MAX_DOCUMENTS):
+        self.backend = backend
+        self.recent = deque(maxlen=max_recent)
+        self.by_document = OrderedDict()
+        self.max_per_document = max_per_document
+        self.max_documents = max_documents
+        self.total = 0
+        self.dropped = 0
+
+        self._queue = None
+        self._writer_task = None
+        self._batches = 0
+
+    def __len__(self) -> int:
+        if self.backend is not None:
+            try:
+                return self.backend.count()
+            except Exception as e:
+                print(f"⚠️  Failed to count logged queries: {e}")
+        return self.total
+
+    def _index(self, entry: Dict):
+        self.recent.append(entry)
+        document_id = entry.get("document_id")
+        if document_id:
+            entries = self.by_document.get(document_id)
+            if entries is None:
+                entries = self.by_document[document_id] = deque(maxlen=self.max_per_document)
+                if len(self.by_document) > self.max_documents:
+                    self.by_document.popitem(last=False)
+            else:
+                self.by_document.move_to_end(document_id)
+            entries.append(entry)
+
+    def record(self, entry: Dict) -> Dict:
+        """Add a query to the history without blocking on database I/O"""
+        entry = dict(entry)
+        entry.setdefault("created_at", datetime.now().isoformat(timespec="seconds"))
+        self.total += 1
+        if self.backend is None:
+            self._index(entry)
+            return entry
+
+        if self._queue is not None:
+            try:
+                self._queue.put_nowait(entry)
+            except asyncio.QueueFull:
+                self.dropped += 1
+        else:
+            # Writer not running (e.g. outside the app lifecycle): write inline
+            try:
+                self._write_batch([entry])
+            except Exception as e:
+                print(f"⚠️  Failed to write query log: {e}")
+        return entry
+
+    def for_document(self, document_id: str, limit: int = None) -> List[Dict]:
+        if self.backend is not None:
+            return self.backend.for_document(document_id, limit)
+        entries = list(self.by_document.get(document_id, ()))
+        return entries[-limit:] if limit else entries
+
+    def latest(self, limit: int = 50) -> List[Dict]:
+        if self.backend is not None:
+            return self.backend.latest(limit)
+        return list(self.recent)[-limit:]
+
+    def _write_batch(self, entries: List[Dict]):
+        self.backend.save_many(entries)
+        self._batches += 1
+        if self._batches % QUERY_LOG_PRUNE_EVERY == 0:
+            self.backend.prune()
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < QUERY_LOG_BATCH_SIZE and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await loop.run_in_executor(None, self._write_batch, batch)
+            except Exception as e:
+                print(f"⚠️  Failed to write query log: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def start(self):
+        """Start the background writer on the running event loop"""
+        if self.backend is None or self._writer_task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=QUERY_LOG_QUEUE_SIZE)
+        self._writer_task = asyncio.create_task(self._writer())
+
+    async def stop(self):
+        """Flush queued entries and stop the background writer"""
+        if self._writer_task is None:
+            return
+        await self._queue.join()
+        self._writer_task.cancel()
+        try:
+            await self._writer_task
+        except asyncio.CancelledError:
+            pass
+        self._writer_task = None
+        self._queue = None
@@ -0,0 +1,36 @@
+import re
+from typing import List
+
+# Sentence ends are punctuation followed by whitespace, so decimals such as
+# "5.5 lakh" and dotted clause numbers never split a sentence
+SENTENCE_END_PATTERN = re.compile(r'[.!?]+(?=\s|$)')
+ABBREVIATION_PATTERN = re.compile(
+    r'(?:^|[\s(])(?:rs|mr|mrs|ms|dr|no|nos|sr|jr|st|ltd|co|inc|vs|viz|approx|cl|sec|art|para|fig|e\.g|i\.e|p\.a|[a-z])$',
+    re.IGNORECASE
+)
+
+# Clause-numbered lines ("4.2 Pre-existing Diseases", "7. CLAIMS") and keyword
+# references ("Section 4 - Exclusions", "Clause IV"); the rest of the line is
+# kept as the section title when it reads like a heading
+NUMBERED_CLAUSE_PATTERN = re.compile(r'^(\d{1,3}(?:\.\d{1,3})+\.?|\d{1,3}[.)])\s+(?=[A-Z(])(.*)$')
+KEYWORD_CLAUSE_PATTERN = re.compile(
+    r'^(?i:clause|section|article|part|sec\.|cl\.)\s+(\d{1,3}(?:\.\d{1,3})*|[IVXLC]{1,6})'
+    r'(?:\s*[.:)\-–—]\s*|\s+(?=[A-Z(])|\s*$)(.*)$'
+)
+
+
+def ends_sentence(text: str, match: re.Match) -> bool:
+    """Whether a ``SENTENCE_END_PATTERN`` match in text closes a sentence rather than an abbreviation"""
+    return match.group() != '.' or not ABBREVIATION_PATTERN.search(text, max(0, match.start() - 12), match.start())
+
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences of a whitespace-normalized text, split the way the chunker splits them"""
+    sentences = []
+    start = 0
+    for match in SENTENCE_END_PATTERN.finditer(text):
+        if ends_sentence(text, match):
+            sentences.append(text[start:match.end()].strip())
+            start = match.end()
+    sentences.append(text[start:].strip())
+    return [sentence for sentence in sentences if sentence]
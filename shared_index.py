@@ -0,0 +1,199 @@
+import os
+import json
+import uuid
+import mmap
+import pickle
+import shutil
+import tempfile
+from typing import Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no flock, and files cannot be renamed or removed while another worker maps them
+    fcntl = None
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from dotenv import load_dotenv
+
+from simple_processor import BM25Index, ChunkList, SectionIndex
+
+load_dotenv()
+
+
+def _default_shared_dir() -> str:
+    # tmpfs keeps the files in RAM, shared by every worker through the page cache
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "hackrx-index")
+
+
+# Directory for memory-mapped chunk/index files; set to an empty value to disable sharing
+SHARED_INDEX_DIR = os.getenv("SHARED_INDEX_DIR", _default_shared_dir())
+if fcntl is None:
+    if SHARED_INDEX_DIR and os.getenv("SHARED_INDEX_DIR"):
+        print("⚠️  Shared index files need POSIX file locks; SHARED_INDEX_DIR is ignored on this platform")
+    SHARED_INDEX_DIR = ""
+
+
+def utf8_offsets(text: str, positions: np.ndarray) -> np.ndarray:
+    """Map character offsets into ``text`` to byte offsets into its UTF-8 encoding"""
+    if text.isascii():
+        return np.asarray(positions, dtype=np.int64)
+    points = np.unique(positions)
+    byte_points = np.zeros(len(points), dtype=np.int64)
+    previous, size = 0, 0
+    for idx, point in enumerate(points.tolist()):
+        size += len(text[previous:point].encode("utf-8"))
+        byte_points[idx] = size
+        previous = point
+    return byte_points[np.searchsorted(points, positions)]
+
+
+class SharedChunkList(ChunkList):
+    """Read-only ChunkList whose document text is a memory-mapped UTF-8 file
+
+    Each worker maps the same file, so the text lives once in the page cache
+    instead of once per process. ``starts``/``ends`` are character offsets;
+    chunk text is decoded from the matching byte range on access.
+    """
+
+    def __init__(self, text_path: str, positions: np.ndarray, byte_positions: np.ndarray):
+        with open(text_path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.starts = positions[:, 0]
+        self.ends = positions[:, 1]
+        self.byte_positions = byte_positions
+
+    @property
+    def text(self) -> str:
+        return self._buffer[:].decode("utf-8")
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._buffer) + self.starts.nbytes + self.ends.nbytes + self.byte_positions.nbytes
+
+    def text_of(self, idx: int) -> str:
+        start, end = self.byte_positions[idx]
+        return self._buffer[int(start):int(end)].decode("utf-8")
+
+
+class SharedIndexStore:
+    """Memory-mapped, multi-process-safe store for chunk text and retrieval indexes
+
+    Each document is published once into ``<root>/<document_id>/`` as raw
+    ``.npy`` arrays plus the normalized text as one UTF-8 file, written to a temp directory and
+    renamed into place so readers never see a partial document. Every uvicorn
+    worker maps the same files; ``acquire``/``release`` serialize ingestion across processes.
+    """
+
+    def __init__(self, root: str = SHARED_INDEX_DIR):
+        self.root = root
+        os.makedirs(os.path.join(root, "locks"), exist_ok=True)
+
+    def _path(self, document_id: str) -> str:
+        return os.path.join(self.root, document_id)
+
+    def has(self, document_id: str) -> bool:
+        return os.path.exists(os.path.join(self._path(document_id), "meta.json"))
+
+    def acquire(self, document_id: str):
+        """Block until this process holds the ingestion lock for a document; returns the handle to release"""
+        lock_file = open(os.path.join(self.root, "locks", f"{document_id}.lock"), 'w')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def release(self, lock_file):
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+    def publish(self, document_id: str, chunks: ChunkList, bm25: BM25Index, tfidf: Optional[Tuple],
+                sections: Optional[SectionIndex] = None):
+        """Write a document's chunks and indexes; a no-op if another worker already did"""
+        if self.has(document_id):
+            return
+        staging = tempfile.mkdtemp(prefix=f".{document_id}.", dir=self.root)
+        try:
+            text = chunks.text
+            with open(os.path.join(staging, "text.bin"), 'wb') as file:
+                file.write(text.encode("utf-8"))
+            positions = np.column_stack([
+                np.frombuffer(chunks.starts, dtype=chunks.starts.typecode),
+                np.frombuffer(chunks.ends, dtype=chunks.ends.typecode)
+            ]).astype(np.int64).reshape(-1, 2)
+            np.save(os.path.join(staging, "chunk_positions.npy"), positions)
+            np.save(os.path.join(staging, "chunk_byte_positions.npy"), utf8_offsets(text, positions))
+
+            for field, array in bm25.to_arrays().items():
+                np.save(os.path.join(staging, f"bm25_{field}.npy"), array)
+
+            if tfidf is not None:
+                vectorizer, matrix = tfidf
+                np.save(os.path.join(staging, "tfidf_data.npy"), matrix.data)
+                np.save(os.path.join(staging, "tfidf_indices.npy"), matrix.indices)
+                np.save(os.path.join(staging, "tfidf_indptr.npy"), matrix.indptr)
+                with open(os.path.join(staging, "tfidf_vectorizer.pkl"), 'wb') as file:
+                    pickle.dump(vectorizer, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+            meta = {
+                "vocabulary": bm25.vocabulary,
+                "k1": bm25.k1,
+                "b": bm25.b,
+                "tfidf_shape": list(tfidf[1].shape) if tfidf is not None else None,
+                "sections": sections.to_list() if sections is not None else []
+            }
+            with open(os.path.join(staging, "meta.json"), 'w') as file:
+                json.dump(meta, file)
+
+            os.rename(staging, self._path(document_id))
+        except OSError:
+            # Lost the race to another worker (target exists) or disk trouble: readers are unaffected
+            shutil.rmtree(staging, ignore_errors=True)
+            if not self.has(document_id):
+                raise
+
+    def load(self, document_id: str) -> Optional[Tuple[SharedChunkList, BM25Index, Optional[Tuple], SectionIndex]]:
+        """Map a published document; returns ``(chunks, bm25, tfidf, sections)`` or None"""
+        path = self._path(document_id)
+        if not self.has(document_id):
+            return None
+
+        with open(os.path.join(path, "meta.json")) as file:
+            meta = json.load(file)
+
+        def mapped(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, name), mmap_mode='r')
+
+        chunks = SharedChunkList(
+            os.path.join(path, "text.bin"),
+            mapped("chunk_positions.npy"),
+            mapped("chunk_byte_positions.npy")
+        )
+        bm25 = BM25Index.from_arrays(
+            {field: mapped(f"bm25_{field}.npy") for field in BM25Index.ARRAY_FIELDS},
+            meta["vocabulary"], k1=meta["k1"], b=meta["b"]
+        )
+
+        tfidf = None
+        if meta["tfidf_shape"] is not None:
+            with open(os.path.join(path, "tfidf_vectorizer.pkl"), 'rb') as file:
+                vectorizer = pickle.load(file)
+            matrix = csr_matrix(
+                (mapped("tfidf_data.npy"), mapped("tfidf_indices.npy"), mapped("tfidf_indptr.npy")),
+                shape=tuple(meta["tfidf_shape"]), copy=False
+            )
+            tfidf = (vectorizer, matrix)
+
+        return chunks, bm25, tfidf, SectionIndex(meta.get("sections", ()))
+
+    def remove(self, document_id: str):
+        """Unpublish a document; workers that already mapped it keep their mapping until they drop it"""
+        path = self._path(document_id)
+        # Rename first so readers never see a half-deleted document
+        doomed = os.path.join(self.root, f".{document_id}.removed.{uuid.uuid4().hex}")
+        try:
+            os.rename(path, doomed)
+        except OSError:
+            return
+        shutil.rmtree(doomed, ignore_errors=True)
@@ -1,267 +1,1290 @@
 import os
-import requests
-import PyPDF2
-import docx
-from io import BytesIO
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Optional, Union
 import google.generativeai as genai
 from dotenv import load_dotenv
 import hashlib
 import json
 import re
+import math
+import time
+import heapq
+import asyncio
+import multiprocessing
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
 import numpy as np
+from downloader import AsyncDocumentDownloader
+from extractors import (EXTRACTORS, ExtractionStats, content_size, count_pages, detect_format,
+                        document_class, extract_pages)
+from document_store import SingleFlight
+from answer_cache import answer_key
+from context_builder import CONTEXT_TOKEN_BUDGET, build_context, select_context_hits
+from extractive import EXTRACTIVE_ANSWERS, EXTRACTIVE_FALLBACK_COVERAGE, EXTRACTIVE_MIN_COVERAGE, extract_answer
+from sentences import KEYWORD_CLAUSE_PATTERN, NUMBERED_CLAUSE_PATTERN, SENTENCE_END_PATTERN, ends_sentence
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from sklearn.feature_extraction.text import TfidfVectorizer
 
 load_dotenv()
 
-class SimpleDocumentProcessor:
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+# Gemini calls taking longer fail over to the extractive answer, when there is one
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "30"))
+# Questions packed into one Gemini prompt by /hackrx/run; 0 or 1 asks each question separately
+ANSWER_BATCH_SIZE = int(os.getenv("ANSWER_BATCH_SIZE", "0"))
+IO_THREAD_WORKERS = int(os.getenv("IO_THREAD_WORKERS", "32"))
+EXTRACTION_PROCESS_WORKERS = int(os.getenv("EXTRACTION_PROCESS_WORKERS", str(os.cpu_count() or 1)))
+PDF_MIN_PAGES_PER_TASK = int(os.getenv("PDF_MIN_PAGES_PER_TASK", "16"))
+DOCUMENT_CACHE_MAX_BYTES = int(os.getenv("DOCUMENT_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# Documents allowed in each ingestion stage at once, so bulk loads pipeline
+# downloads, extractions and index builds instead of running them one by one
+INGEST_DOWNLOAD_CONCURRENCY = int(os.getenv("INGEST_DOWNLOAD_CONCURRENCY", "16"))
+INGEST_EXTRACT_CONCURRENCY = int(os.getenv("INGEST_EXTRACT_CONCURRENCY", "4"))
+INGEST_INDEX_CONCURRENCY = int(os.getenv("INGEST_INDEX_CONCURRENCY", "2"))
+
+# Rough per-term overhead used when estimating resident document size
+VOCABULARY_ENTRY_BYTES = 100
+
+TOKEN_PATTERN = re.compile(r"\w+")
+JSON_FENCE_PATTERN = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokenizer shared by indexing and querying"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def content_document_id(content: Union[bytes, str]) -> str:
+    """Content-addressed document id: SHA-256 of the raw bytes or of a file's contents"""
+    hasher = hashlib.sha256()
+    if isinstance(content, str):
+        with open(content, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b""):
+                hasher.update(block)
+    else:
+        hasher.update(content)
+    return hasher.hexdigest()
+
+
+def split_page_ranges(page_count: int, parts: int) -> List[tuple]:
+    """Split page_count pages into at most `parts` contiguous, near-equal ranges"""
+    parts = max(1, min(parts, page_count))
+    bounds = [round(i * page_count / parts) for i in range(parts + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(parts) if bounds[i] < bounds[i + 1]]
+
+
+def parse_batched_answers(text: str, count: int) -> Dict[int, str]:
+    """Answers by 1-based question number from a ``{"answers": [{"id", "answer"}]}`` reply
+
+    Answers that are missing, empty or numbered outside ``1..count`` are
+    left out, so the caller can ask those questions again one by one.
+    """
+    text = JSON_FENCE_PATTERN.sub("", text)
+    try:
+        data = json.loads(text)
+    except ValueError:
+        # Without a JSON response mode the model sometimes wraps the object in a sentence
+        start, end = text.find("{"), text.rfind("}")
+        if start < 0 or end < start:
+            raise
+        data = json.loads(text[start:end + 1])
+    items = data.get("answers", []) if isinstance(data, dict) else data
+    answers = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            number = int(item.get("id"))
+        except (TypeError, ValueError):
+            continue
+        answer = item.get("answer")
+        if 1 <= number <= count and isinstance(answer, str) and answer.strip():
+            answers[number] = answer.strip()
+    return answers
+
+
+# How each retrieval path labels its hits, for the answer's reasoning
+RANKER_NAMES = {"bm25": "BM25", "tfidf": "TF-IDF"}
+# Score multiplier for chunks in a section the question names ("clause 4.2", "Exclusions")
+SECTION_SCORE_BOOST = 2.0
+
+
+def retrieval_label(hits: List[Dict]) -> str:
+    """Name of the ranker(s) behind a list of hits, such as 'TF-IDF' or 'BM25 + section index'"""
+    rankers = []
+    for hit in hits:
+        name = RANKER_NAMES.get(hit.get("ranker"), "similarity")
+        if name not in rankers:
+            rankers.append(name)
+    if any(hit.get("section") for hit in hits):
+        rankers.append("section index")
+    return " + ".join(rankers) or "similarity"
+
+
+def estimate_document_bytes(chunks: "ChunkList", bm25: "BM25Index" = None, tfidf: tuple = None) -> int:
+    """Approximate resident bytes of a processed document: text, chunk offsets and index arrays"""
+    size = chunks.nbytes
+
+    if bm25 is not None:
+        size += sum(array.nbytes for array in bm25.to_arrays().values()) + bm25.length_norm.nbytes
+        size += sum(len(term) + VOCABULARY_ENTRY_BYTES for term in bm25.vocabulary)
+    if tfidf is not None:
+        vectorizer, matrix = tfidf
+        size += matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+        size += VOCABULARY_ENTRY_BYTES * len(getattr(vectorizer, "vocabulary_", ()))
+    return size
+
+
+class BM25Index:
+    """Per-document inverted index scored with Okapi BM25
+
+    Postings are frozen into CSR-style arrays: the postings of term ``t`` are
+    ``chunk_ids[indptr[t]:indptr[t + 1]]`` with matching ``term_freqs``, so a
+    query only touches the chunks that share at least one term with it. The
+    per-chunk length normalization is computed once, when the arrays are set.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary = {}
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.chunk_ids = np.zeros(0, dtype=np.int32)
+        self.term_freqs = np.zeros(0, dtype=np.float32)
+        self.doc_freqs = np.zeros(0, dtype=np.int32)
+        self.chunk_lengths = np.zeros(0, dtype=np.float32)
+        self.avg_chunk_length = 0.0
+        self.length_norm = np.zeros(0, dtype=np.float32)
+
+    def _normalize_lengths(self):
+        """Precompute the BM25 length term ``k1 * (1 - b + b * len / avg_len)`` of every chunk"""
+        self.avg_chunk_length = float(self.chunk_lengths.mean()) if len(self.chunk_lengths) else 0.0
+        self.length_norm = (self.k1 * (1 - self.b + self.b * self.chunk_lengths
+                                       / max(self.avg_chunk_length, 1e-9))).astype(np.float32)
+
+    def __getstate__(self) -> Dict:
+        # length_norm is derived from chunk_lengths, so it is not pickled
+        state = dict(self.__dict__)
+        state.pop("length_norm", None)
+        return state
+
+    def __setstate__(self, state: Dict):
+        self.__dict__.update(state)
+        self._normalize_lengths()
+
+    @classmethod
+    def build(cls, texts: List[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """Build the index from chunk texts in a single pass"""
+        builder = BM25IndexBuilder(k1=k1, b=b)
+        for text in texts:
+            builder.add(text)
+        return builder.freeze()
+
+    ARRAY_FIELDS = ("indptr", "chunk_ids", "term_freqs", "doc_freqs", "chunk_lengths")
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Export the postings arrays, e.g. to write them to memory-mapped files"""
+        return {field: getattr(self, field) for field in self.ARRAY_FIELDS}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], vocabulary: Dict[str, int],
+                    k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """Rebuild an index around existing (possibly memory-mapped) postings arrays"""
+        index = cls(k1=k1, b=b)
+        index.vocabulary = vocabulary
+        for field in cls.ARRAY_FIELDS:
+            setattr(index, field, arrays[field])
+        index._normalize_lengths()
+        return index
+
+    def __len__(self) -> int:
+        return len(self.chunk_lengths)
+
+    def score(self, query: str) -> Dict[int, float]:
+        """Return BM25 scores for every chunk sharing a term with the query"""
+        num_chunks = len(self)
+        if not num_chunks:
+            return {}
+
+        scores = {}
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            ids = self.chunk_ids[start:end]
+            tfs = self.term_freqs[start:end]
+            df = int(self.doc_freqs[term_id])
+            idf = math.log(1 + (num_chunks - df + 0.5) / (df + 0.5))
+            contributions = idf * tfs * (self.k1 + 1) / (tfs + self.length_norm[ids])
+            for chunk_idx, value in zip(ids.tolist(), contributions.tolist()):
+                scores[chunk_idx] = scores.get(chunk_idx, 0.0) + value
+
+        return scores
+
+
+class BM25IndexBuilder:
+    """Incrementally collects postings; ``freeze`` returns a BM25Index over the chunks added so far"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.lengths = []
+        self._frozen = None
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def add(self, text: str):
+        chunk_idx = len(self.lengths)
+        tokens = tokenize(text)
+        self.lengths.append(len(tokens))
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, tf in counts.items():
+            self.postings.setdefault(term, []).append((chunk_idx, tf))
+        self._frozen = None
+
+    def freeze(self) -> BM25Index:
+        """Snapshot the postings into CSR arrays (cached until the next add)"""
+        if self._frozen is not None:
+            return self._frozen
+
+        index = BM25Index(k1=self.k1, b=self.b)
+        indptr = [0]
+        chunk_ids = []
+        term_freqs = []
+        for term_id, (term, entries) in enumerate(self.postings.items()):
+            index.vocabulary[term] = term_id
+            chunk_ids.extend(chunk_idx for chunk_idx, _ in entries)
+            term_freqs.extend(tf for _, tf in entries)
+            indptr.append(len(chunk_ids))
+
+        index.indptr = np.asarray(indptr, dtype=np.int64)
+        index.chunk_ids = np.asarray(chunk_ids, dtype=np.int32)
+        index.term_freqs = np.asarray(term_freqs, dtype=np.float32)
+        index.doc_freqs = np.diff(index.indptr).astype(np.int32)
+        index.chunk_lengths = np.asarray(self.lengths, dtype=np.float32)
+        index._normalize_lengths()
+        self._frozen = index
+        return index
+
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+class TextBuffer:
+    """Append-only text assembled from pieces; slicing joins only the pieces a range touches"""
+
     def __init__(self):
-        # Initialize Gemini
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        self.gemini_model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        self.parts = []
+        self.offsets = []
+        self.length = 0
+
+    def __len__(self) -> int:
+        return self.length
+
+    def append(self, piece: str):
+        if not piece:
+            return
+        self.offsets.append(self.length)
+        self.parts.append(piece)
+        self.length += len(piece)
+
+    def __getitem__(self, key: slice) -> str:
+        start, stop, _ = key.indices(self.length)
+        if start >= stop:
+            return ""
+        idx = bisect_right(self.offsets, start) - 1
+        pieces = []
+        while idx < len(self.parts) and self.offsets[idx] < stop:
+            part_start = self.offsets[idx]
+            pieces.append(self.parts[idx][max(0, start - part_start):stop - part_start])
+            idx += 1
+        return "".join(pieces)
+
+    def getvalue(self) -> str:
+        return "".join(self.parts)
+
+
+class Chunk:
+    """One chunk of a ChunkList: its offsets into the document text, sliced out on demand"""
+
+    __slots__ = ("index", "start", "end", "_owner")
+
+    def __init__(self, owner: "ChunkList", index: int, start: int, end: int):
+        self._owner = owner
+        self.index = index
+        self.start = start
+        self.end = end
+
+    @property
+    def id(self) -> str:
+        return f"chunk_{self.index}"
+
+    @property
+    def text(self) -> str:
+        return self._owner.text_of(self.index)
+
+    def __repr__(self) -> str:
+        return f"Chunk({self.id}, {self.start}:{self.end})"
+
+
+class ChunkList:
+    """A document's chunks as ``(start, end)`` offsets into its normalized text
+
+    The text is held once and overlapping chunks share it; offsets live in
+    two compact ``array('I')`` columns. Chunk text is only sliced out when it
+    is indexed or goes into a prompt or a response.
+    """
+
+    def __init__(self, text: Union[str, TextBuffer] = "", spans=()):
+        self.text = text
+        self.starts = array('I')
+        self.ends = array('I')
+        for start, end in spans:
+            self.append(start, end)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def append(self, start: int, end: int):
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def text_of(self, idx: int) -> str:
+        return self.text[self.starts[idx]:self.ends[idx]]
+
+    def texts(self):
+        for idx in range(len(self)):
+            yield self.text_of(idx)
+
+    def _chunk(self, idx: int) -> Chunk:
+        return Chunk(self, idx, int(self.starts[idx]), int(self.ends[idx]))
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self._chunk(i) for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("chunk index out of range")
+        return self._chunk(idx)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self._chunk(idx)
+
+    def prefix(self, count: int) -> "ChunkList":
+        """The first ``count`` chunks, sharing this list's text"""
+        chunks = ChunkList(self.text)
+        chunks.starts = self.starts[:count]
+        chunks.ends = self.ends[:count]
+        return chunks
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.text) + self.starts.itemsize * (len(self.starts) + len(self.ends))
+
+    def offsets_bytes(self) -> bytes:
+        """Serialize the offsets (not the text) for the persistent store"""
+        return self.starts.tobytes() + self.ends.tobytes()
+
+    @classmethod
+    def from_offsets_bytes(cls, text: str, data: bytes) -> "ChunkList":
+        chunks = cls(text)
+        if len(data) % (2 * chunks.starts.itemsize):
+            raise ValueError("malformed chunk offsets")
+        half = len(data) // 2
+        chunks.starts.frombytes(data[:half])
+        chunks.ends.frombytes(data[half:])
+        if any(start > end or end > len(text) for start, end in zip(chunks.starts, chunks.ends)):
+            raise ValueError("chunk offsets do not fit the stored text")
+        return chunks
+
+
+CLAUSE_REFERENCE_PATTERN = re.compile(
+    r'\b(?:clause|section|article|part|sec\.?|cl\.?|para(?:graph)?)\s*(?:no\.?\s*)?(\d+(?:\.\d+)*|[ivxlc]+)\b',
+    re.IGNORECASE
+)
+PAGE_LABEL_PATTERN = re.compile(r'^page\s+\d+', re.IGNORECASE)
+HEADING_STOPWORDS = {"a", "an", "and", "as", "at", "by", "for", "in", "of", "on", "or", "the", "to", "with", "&"}
+MAX_HEADING_CHARS = 80
+MAX_HEADING_WORDS = 10
+# A heading seen on more pages than this is a running header, not a section
+MAX_HEADING_REPEATS = 3
+
+
+def section_key(text: str) -> str:
+    """Lookup key for a clause number or heading: lowercase words, dotted numbers kept"""
+    return re.sub(r'[^\w.]+', ' ', text.lower()).strip(' .')
+
+
+def heading_title(text: str) -> Optional[str]:
+    """The text as a heading title, or None when it reads like body text"""
+    text = text.strip().rstrip(':–—-').strip()
+    if not text or len(text) > MAX_HEADING_CHARS or len(text.split()) > MAX_HEADING_WORDS or text[-1] in '.,;':
+        return None
+    return text
+
+
+def looks_like_heading(line: str, previous: str) -> bool:
+    """Short ALL-CAPS lines, or Title Case lines that open a block or end with a colon"""
+    if len(line) > MAX_HEADING_CHARS or line[-1] in '.,;' or " | " in line or PAGE_LABEL_PATTERN.match(line):
+        return False
+    words = line.rstrip(':').split()
+    if not words or len(words) > MAX_HEADING_WORDS or sum(c.isalpha() for c in line) < 3:
+        return False
+    if line.isupper():
+        return True
+    significant = [word for word in words if word.lower() not in HEADING_STOPWORDS]
+    title_case = bool(significant) and all(word[0].isupper() or not word[0].isalpha() for word in significant)
+    opens_block = not previous or previous[-1] in '.:!?'
+    return title_case and (opens_block or line.endswith(':'))
+
+
+def detect_section(line: str, previous: str = "") -> Optional[tuple]:
+    """``(clause_id, title)`` when a raw text line opens a numbered clause or a heading"""
+    match = KEYWORD_CLAUSE_PATTERN.match(line) or NUMBERED_CLAUSE_PATTERN.match(line)
+    if match:
+        return match.group(1).rstrip('.)'), heading_title(match.group(2))
+    if looks_like_heading(line, previous):
+        return None, heading_title(line)
+    return None
+
+
+def normalize_with_sections(text: str) -> tuple:
+    """Whitespace-normalize text line by line, noting where clauses and headings start
+
+    Returns the same text as ``WHITESPACE_PATTERN.sub(' ', text).strip()``
+    plus ``(offset, clause_id, title)`` for every line that opens a section.
+    Line breaks are only visible before normalization, so this is where
+    headings are recognized.
+    """
+    parts = []
+    sections = []
+    length = 0
+    previous = ""
+    for line in text.splitlines():
+        line = WHITESPACE_PATTERN.sub(' ', line).strip()
+        if not line:
+            previous = ""
+            continue
+        if parts:
+            length += 1
+        section = detect_section(line, previous)
+        if section is not None and (section[0] or section[1]):
+            sections.append((length,) + section)
+        parts.append(line)
+        length += len(line)
+        previous = line
+    return " ".join(parts), sections
+
+
+def extract_normalized_pages(document: Union[bytes, str], fmt: str, start: int = 0, end: int = None,
+                             engines: List[str] = None) -> tuple:
+    """``extract_pages`` plus ``normalize_with_sections`` of each page, for one process-pool task
+
+    Returns ``([(normalized_text, sections), ...], engine, seconds)``; the
+    seconds cover extraction only, as the engine statistics expect.
+    """
+    pages, engine, seconds = extract_pages(document, fmt, start, end, engines)
+    return [normalize_with_sections(page) for page in pages], engine, seconds
+
+
+def fit_tfidf(texts: List[str]) -> Optional[tuple]:
+    """Fit a TF-IDF vectorizer on chunk texts; returns it with the CSR chunk matrix, or None"""
+    if not texts:
+        return None
+    vectorizer = TfidfVectorizer(tokenizer=tokenize, lowercase=False, token_pattern=None, sublinear_tf=True)
+    try:
+        matrix = vectorizer.fit_transform(texts)
+    except ValueError:
+        # Every chunk was empty after tokenization
+        return None
+    return vectorizer, matrix.tocsr()
+
+
+class SectionIndex:
+    """Clause numbers and headings of a document, keyed for direct lookup
+
+    Entries are ``(start, level, clause_id, title)`` in text order, where
+    ``start`` is the section's offset in the normalized text and ``level``
+    its nesting depth: 0 for an unnumbered heading, 1 for "4." and 2 for
+    "4.2". A section runs until the next entry at the same or a higher level.
+    """
+
+    def __init__(self, entries=()):
+        self.entries = []
+        self.clauses = {}
+        self.headings = {}
+        for start, _, clause_id, title in entries:
+            self.add(start, clause_id, title)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, start: int, clause_id: str = None, title: str = None):
+        if clause_id:
+            level = clause_id.count('.') + 1 if clause_id[0].isdigit() else 1
+        else:
+            level = 0
+        idx = len(self.entries)
+        self.entries.append((start, level, clause_id, title))
+        if clause_id:
+            self.clauses.setdefault(section_key(clause_id), []).append(idx)
+        if title:
+            self.headings.setdefault(section_key(title), []).append(idx)
+
+    def to_list(self) -> List[list]:
+        return [list(entry) for entry in self.entries]
+
+    def lookup(self, question: str) -> tuple:
+        """``(entries, explicit)``: the clauses the question references, else the longest heading it mentions
+
+        ``explicit`` is True when the entries come from a clause reference
+        such as "clause 4.2" rather than from heading words.
+        """
+        found = []
+        for match in CLAUSE_REFERENCE_PATTERN.finditer(question):
+            found.extend(self.clauses.get(section_key(match.group(1)), ()))
+        if found:
+            return found, True
+
+        padded = f" {section_key(question)} "
+        named = [
+            key for key, entries in self.headings.items()
+            if len(key) >= 4 and len(entries) <= MAX_HEADING_REPEATS and f" {key} " in padded
+        ]
+        if not named:
+            return [], False
+        return list(self.headings[max(named, key=len)]), False
+
+    def span(self, idx: int) -> tuple:
+        """``(start, end)`` of an entry's section; ``end`` is None for the last section"""
+        start, level = self.entries[idx][:2]
+        for entry in self.entries[idx + 1:]:
+            if entry[1] <= level:
+                return start, entry[0]
+        return start, None
+
+    def chunk_range(self, idx: int, chunks: "ChunkList") -> range:
+        """Indexes of the chunks overlapping an entry's section"""
+        start, end = self.span(idx)
+        first = bisect_right(chunks.ends, start)
+        last = len(chunks) if end is None else bisect_left(chunks.starts, end)
+        return range(first, max(first, last))
+
+
+class StreamingChunker:
+    """Sentence-packing chunker over a text that arrives piece by piece
+
+    ``feed`` appends normalized text, with the offsets where sections start,
+    and returns the ``(start, end)`` offsets of the chunks completed so far;
+    ``finish`` flushes the rest. A chunk is a contiguous slice of the text
+    that packs whole sentences up to ``chunk_size`` characters; the next one
+    starts ``overlap`` characters, snapped to a word boundary, before its
+    end. A section start closes the current chunk without overlap once it
+    holds ``min_section`` characters, so clauses do not bleed into each other.
+    Only the text of the chunk still being packed is held.
+    """
+
+    def __init__(self, chunk_size: int = 1500, overlap: int = 300, min_section: int = None):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.min_section = chunk_size // 5 if min_section is None else min_section
+        self.window = ""
+        self.window_start = 0
+        self.sentence_start = 0
+        self.section_starts = deque()
+        self.chunk_start = None
+        self.chunk_end = 0
+
+    def feed(self, text: str, section_starts=()) -> List[tuple]:
+        self.window += text
+        self.section_starts.extend(section_starts)
+        return self._scan(final=False)
+
+    def finish(self) -> List[tuple]:
+        spans = self._scan(final=True)
+        if self.chunk_start is not None:
+            spans.append((self.chunk_start, self.chunk_end))
+            self.chunk_start = None
+        self.section_starts.clear()
+        return spans
+
+    def _scan(self, final: bool) -> List[tuple]:
+        spans = []
+        window_end = self.window_start + len(self.window)
+        for match in SENTENCE_END_PATTERN.finditer(self.window, self.sentence_start - self.window_start):
+            if match.end() == len(self.window) and not final:
+                # The punctuation run may continue in the next piece
+                break
+            if not ends_sentence(self.window, match):
+                continue
+            self._add_until(self.window_start + match.end(), spans)
+        if final and self.sentence_start < window_end:
+            self._add_until(window_end, spans)
+
+        # Keep only the chunk being packed and the unfinished sentence
+        keep = self.chunk_start if self.chunk_start is not None else self.sentence_start
+        self.window = self.window[keep - self.window_start:]
+        self.window_start = keep
+        return spans
+
+    def _add_until(self, end: int, spans: List[tuple]):
+        """Add the text up to ``end`` as sentences, closing chunks at section starts on the way"""
+        while self.section_starts and self.section_starts[0] < end:
+            section_start = self.section_starts.popleft()
+            if section_start > self.sentence_start:
+                self._add_sentence(self.sentence_start, section_start, spans)
+                self.sentence_start = section_start
+            if self.chunk_start is not None and self.chunk_end - self.chunk_start >= self.min_section:
+                spans.append((self.chunk_start, self.chunk_end))
+                self.chunk_start = None
+        self._add_sentence(self.sentence_start, end, spans)
+        self.sentence_start = end
+
+    def _add_sentence(self, start: int, end: int, spans: List[tuple]):
+        sentence = self.window[start - self.window_start:end - self.window_start]
+        stripped = sentence.strip()
+        if not stripped:
+            return
+        start += len(sentence) - len(sentence.lstrip())
+        end = start + len(stripped)
+
+        if self.chunk_start is None:
+            self.chunk_start = start
+        elif end - self.chunk_start > self.chunk_size:
+            spans.append((self.chunk_start, self.chunk_end))
+            self.chunk_start = self._overlap_start() if self.overlap > 0 else start
+        self.chunk_end = end
+
+    def _overlap_start(self) -> int:
+        start = max(self.chunk_start, self.chunk_end - self.overlap)
+        if start > self.chunk_start:
+            # Do not open the next chunk mid-word
+            space = self.window.find(' ', start - self.window_start, self.chunk_end - self.window_start)
+            if space != -1:
+                start = self.window_start + space + 1
+        return start
+
+
+class StreamingIngest:
+    """A document being ingested page by page
+
+    Pages arrive already normalized (``normalize_with_sections`` runs in the
+    extraction workers) and are appended to one growing TextBuffer, then
+    chunked and indexed as they arrive, so retrieval can run against the
+    indexed prefix while later pages are still extracting. Clauses and
+    headings found on the way go into a SectionIndex. The full text is
+    joined once, at the end.
+    """
+
+    def __init__(self, document_id: str, total_pages: int = None):
+        self.document_id = document_id
+        self.total_pages = total_pages
+        self.buffer = TextBuffer()
+        self.page_offsets = []
+        self.chunks = ChunkList(self.buffer)
+        self.sections = SectionIndex()
+        self.chunker = StreamingChunker()
+        self.builder = BM25IndexBuilder()
+        self.complete = False
+        self._lock = threading.Lock()
+
+    def add_pages(self, pages: List[tuple]):
+        """Append ``(normalized_text, sections)`` pages and chunk and index what they complete"""
+        for normalized, found in pages:
+            piece = " " + normalized if len(self.buffer) and normalized else normalized
+            page_start = len(self.buffer) + len(piece) - len(normalized)
+            self.page_offsets.append(page_start)
+            with self._lock:
+                for offset, clause_id, title in found:
+                    self.sections.add(page_start + offset, clause_id, title)
+            self.buffer.append(piece)
+            self._add_chunks(self.chunker.feed(piece, [page_start + offset for offset, _, _ in found]))
+
+    def finish(self) -> tuple:
+        """Flush the chunker; returns ``(text, chunks, page_offsets)`` with chunks over the joined text"""
+        self._add_chunks(self.chunker.finish())
+        text = self.buffer.getvalue()
+        chunks = ChunkList(text)
+        chunks.starts, chunks.ends = self.chunks.starts, self.chunks.ends
+        self.complete = True
+        return text, chunks, self.page_offsets
+
+    def _add_chunks(self, spans: List[tuple]):
+        if not spans:
+            return
+        with self._lock:
+            for start, end in spans:
+                self.builder.add(self.buffer[start:end])
+                self.chunks.append(start, end)
+
+    def snapshot(self) -> tuple:
+        """Consistent ``(chunks, bm25, sections)`` view of the indexed prefix; sections are a copy"""
+        with self._lock:
+            return self.chunks.prefix(len(self.builder)), self.builder.freeze(), SectionIndex(self.sections.entries)
+
+    def progress(self) -> Dict:
+        return {
+            "pages_extracted": len(self.page_offsets),
+            "total_pages": self.total_pages,
+            "chunks_indexed": len(self.builder),
+            "complete": self.complete
+        }
+
+
+class SimpleDocumentProcessor:
+    def __init__(self, backing_store=None, shared_index=None, answer_cache=None, semantic_cache=None):
+        # Gemini is configured on first use so extraction workers never touch it
+        self._gemini_model = None
         
-        # Simple in-memory storage for processed documents
+        # Simple in-memory storage for processed documents, optionally backed by a
+        # persistent store (see document_store.SQLDocumentBackend) for warm restarts
         self.document_chunks = {}
-    
-    def download_document(self, url: str) -> bytes:
-        """Download document from URL"""
-        try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            return response.content
-        except Exception as e:
-            raise Exception(f"Failed to download document: {str(e)}")
-    
-    def extract_text_from_pdf(self, content: Union[bytes, str]) -> str:
-        """Extract text from PDF"""
+        self.document_indexes = {}
+        self.document_matrices = {}
+        self.document_sections = {}
+
+        # Documents still being ingested, searchable over their indexed prefix
+        self.partial_documents = {}
+        self.backing_store = backing_store
+
+        # Byte-accounted LRU over the dicts above; listeners are told about
+        # evictions so registries such as main_final.documents_storage stay in step
+        self.cache_max_bytes = DOCUMENT_CACHE_MAX_BYTES
+        self.cache_bytes = 0
+        self.document_sizes = OrderedDict()
+        self.eviction_listeners = []
+        self._cache_lock = threading.RLock()
+
+        # Memory-mapped chunk/index files shared by every worker process on the box
+        # (see shared_index.SharedIndexStore); None keeps indexes private to this process
+        self.shared_index = shared_index
+
+        # Blocking I/O (downloads, database and shared-index access, answer
+        # generation waiting on Gemini) runs on a thread pool, as do the light
+        # sequential ingest steps: sentence chunking across page boundaries and
+        # BM25 postings. CPU-heavy extraction, page normalization and the TF-IDF
+        # fit run in a process pool created on demand
+        self.io_executor = ThreadPoolExecutor(max_workers=IO_THREAD_WORKERS, thread_name_prefix="hackrx-io")
+        self._cpu_executor = None
+
+        # Gemini requests run here so call_gemini can stop waiting on one after
+        # GEMINI_TIMEOUT_SECONDS; a timed-out request keeps its thread until it returns
+        self.llm_executor = ThreadPoolExecutor(max_workers=IO_THREAD_WORKERS, thread_name_prefix="hackrx-llm")
+
+        # Pooled async HTTP client for document downloads
+        self.downloader = AsyncDocumentDownloader()
+
+        # Concurrent ingests of identical bytes share one extraction
+        self.inflight_extractions = SingleFlight()
+
+        # Independent limits per ingestion stage (network, process pool, indexing)
+        self.stage_slots = {
+            "download": asyncio.Semaphore(max(1, INGEST_DOWNLOAD_CONCURRENCY)),
+            "extract": asyncio.Semaphore(max(1, INGEST_EXTRACT_CONCURRENCY)),
+            "index": asyncio.Semaphore(max(1, INGEST_INDEX_CONCURRENCY))
+        }
+
+        # Timings per document class and extraction engine, used to try the fastest engine first
+        self.extraction_stats = ExtractionStats()
+
+        # Answers for repeated (document, question, retrieved chunks) triples
+        # (see answer_cache.AnswerCache); None calls Gemini every time
+        self.answer_cache = answer_cache
+
+        # Answers reused across paraphrased questions on the same document
+        # (see answer_cache.SemanticAnswerCache); consulted after an exact miss
+        self.semantic_cache = semantic_cache
+
+    @property
+    def gemini_model(self):
+        if self._gemini_model is None:
+            genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+            self._gemini_model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        return self._gemini_model
+
+    @gemini_model.setter
+    def gemini_model(self, model):
+        self._gemini_model = model
+
+    async def arun_cpu(self, fn, *args):
+        """Run ``fn`` in the process pool; a crashed worker poisons the pool, so a fresh one starts next time"""
         try:
-            if isinstance(content, str):
-                with open(content, 'rb') as file:
-                    reader = PyPDF2.PdfReader(file)
-                    text = ""
-                    for page in reader.pages:
-                        text += page.extract_text() + "\n"
-            else:
-                pdf_file = BytesIO(content)
-                reader = PyPDF2.PdfReader(pdf_file)
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-            return text
-        except Exception as e:
-            raise Exception(f"Failed to extract PDF text: {str(e)}")
+            return await asyncio.get_running_loop().run_in_executor(self.cpu_executor, fn, *args)
+        except BrokenProcessPool:
+            self._cpu_executor = None
+            raise
+
+    @property
+    def cpu_executor(self) -> ProcessPoolExecutor:
+        if self._cpu_executor is None:
+            # spawn avoids forking a process that already runs event-loop and pool threads
+            self._cpu_executor = ProcessPoolExecutor(
+                max_workers=max(1, EXTRACTION_PROCESS_WORKERS),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._cpu_executor
+
+    async def aclose(self):
+        """Close the async HTTP client and release the worker pools"""
+        await self.downloader.aclose()
+        self.shutdown()
+
+    def shutdown(self):
+        """Release the worker pools"""
+        self.io_executor.shutdown(wait=False, cancel_futures=True)
+        self.llm_executor.shutdown(wait=False, cancel_futures=True)
+        if self._cpu_executor is not None:
+            self._cpu_executor.shutdown(wait=False, cancel_futures=True)
+            self._cpu_executor = None
     
-    def extract_text_from_docx(self, content: Union[bytes, str]) -> str:
-        """Extract text from DOCX"""
-        try:
-            if isinstance(content, str):
-                doc = docx.Document(content)
-            else:
-                doc = docx.Document(BytesIO(content))
-            
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
-        except Exception as e:
-            raise Exception(f"Failed to extract DOCX text: {str(e)}")
+    def chunk_text(self, text: str, chunk_size: int = 1500, overlap: int = 300) -> ChunkList:
+        """Split text into overlapping, section-aligned chunks over its whitespace-normalized form"""
+        text, sections = normalize_with_sections(text)
+        chunker = StreamingChunker(chunk_size, overlap)
+        return ChunkList(text, chunker.feed(text, [offset for offset, _, _ in sections]) + chunker.finish())
     
-    def extract_text_from_txt(self, content: Union[bytes, str]) -> str:
-        """Extract text from TXT file"""
+    def index_document(self, document_id: str, chunks: ChunkList, bm25: BM25Index = None,
+                       sections: SectionIndex = None, tfidf: tuple = None):
+        """Store chunks and build the retrieval indexes not passed in"""
+        self.document_chunks[document_id] = chunks
+        self.document_indexes[document_id] = bm25 if bm25 is not None else BM25Index.build(chunks.texts())
+        self.document_matrices[document_id] = tfidf if tfidf is not None else self.build_tfidf_matrix(chunks)
+        self.document_sections[document_id] = sections if sections is not None else SectionIndex()
+
+        if self.backing_store is not None:
+            try:
+                self.backing_store.save_content(
+                    document_id, chunks.text, chunks.offsets_bytes(),
+                    (self.document_indexes[document_id], self.document_matrices[document_id],
+                     self.document_sections[document_id])
+                )
+            except Exception as e:
+                print(f"⚠️  Failed to persist document {document_id[:12]}: {e}")
+
+        self.share_document(document_id)
+        self.account_document(document_id)
+
+    def account_document(self, document_id: str):
+        """Record a document's resident size as most recently used and evict down to the budget"""
+        size = estimate_document_bytes(
+            self.document_chunks[document_id],
+            self.document_indexes.get(document_id),
+            self.document_matrices.get(document_id)
+        )
+        with self._cache_lock:
+            self.cache_bytes += size - self.document_sizes.pop(document_id, 0)
+            self.document_sizes[document_id] = size
+            while self.cache_bytes > self.cache_max_bytes and len(self.document_sizes) > 1:
+                oldest = next(iter(self.document_sizes))
+                self.evict_document(oldest)
+
+    def evict_document(self, document_id: str):
+        """Drop a document's chunks and indexes from memory and unpublish its shared copy"""
+        with self._cache_lock:
+            self.cache_bytes -= self.document_sizes.pop(document_id, 0)
+            self.document_chunks.pop(document_id, None)
+            self.document_indexes.pop(document_id, None)
+            self.document_matrices.pop(document_id, None)
+            self.document_sections.pop(document_id, None)
+
+        # The shared copy goes too, or tmpfs would keep every document ever
+        # ingested; other workers keep their own mappings until they evict it
+        if self.shared_index is not None:
+            try:
+                self.shared_index.remove(document_id)
+            except Exception as e:
+                print(f"⚠️  Failed to remove shared document {document_id[:12]}: {e}")
+
+        reloadable = self.backing_store is not None
+        print(f"🧹 Evicted document {document_id[:12]} from memory (reloadable: {reloadable})")
+        for listener in self.eviction_listeners:
+            listener(document_id, reloadable)
+
+    def share_document(self, document_id: str):
+        """Publish a document to the shared index and swap in the memory-mapped copy"""
+        if self.shared_index is None:
+            return
         try:
-            if isinstance(content, str):
-                with open(content, 'r', encoding='utf-8') as file:
-                    return file.read()
-            else:
-                return content.decode('utf-8')
+            self.shared_index.publish(
+                document_id, self.document_chunks[document_id], self.document_indexes[document_id],
+                self.document_matrices[document_id], self.document_sections.get(document_id)
+            )
+            self.load_shared_document(document_id)
         except Exception as e:
-            raise Exception(f"Failed to extract TXT text: {str(e)}")
-    
-    def process_uploaded_file(self, file_content: bytes, filename: str) -> str:
-        """Process uploaded file content"""
-        file_ext = filename.lower().split('.')[-1]
-        
-        if file_ext == 'pdf':
-            return self.extract_text_from_pdf(file_content)
-        elif file_ext in ['docx', 'doc']:
-            return self.extract_text_from_docx(file_content)
-        elif file_ext == 'txt':
-            return self.extract_text_from_txt(file_content)
-        else:
-            try:
-                return file_content.decode('utf-8')
-            except:
-                raise Exception(f"Unsupported file format: {file_ext}")
-    
-    def extract_text(self, source: str, is_file_path: bool = False) -> str:
-        """Extract text from document URL or file path"""
-        print(f"Processing source: {source}")
-        print(f"Is file path: {is_file_path}")
-        
-        if is_file_path:
-            if source.lower().endswith('.pdf'):
-                return self.extract_text_from_pdf(source)
-            elif source.lower().endswith(('.docx', '.doc')):
-                return self.extract_text_from_docx(source)
-            elif source.lower().endswith('.txt'):
-                return self.extract_text_from_txt(source)
-            else:
-                raise Exception("Unsupported file format")
-        else:
+            print(f"⚠️  Failed to share document {document_id[:12]}: {e}")
+
+    def load_shared_document(self, document_id: str) -> bool:
+        """Map a document published by any worker into this process"""
+        loaded = self.shared_index.load(document_id)
+        if loaded is None:
+            return False
+        (self.document_chunks[document_id],
+         self.document_indexes[document_id],
+         self.document_matrices[document_id],
+         self.document_sections[document_id]) = loaded
+        return True
+
+    def ensure_document(self, document_id: str) -> bool:
+        """Make sure a document's chunks and indexes are in memory, lazily loading them from the backing store"""
+        with self._cache_lock:
+            if document_id in self.document_chunks:
+                if document_id in self.document_sizes:
+                    self.document_sizes.move_to_end(document_id)
+                return True
+        if not document_id:
+            return False
+        if self.shared_index is not None:
             try:
-                content = self.download_document(source)
-                print(f"Downloaded content size: {len(content)} bytes")
-                print(f"Content header: {content[:50]}")
-                
-                # Extract file extension from URL (handle query parameters)
-                url_path = source.split('?')[0]  # Remove query parameters
-                print(f"URL path without query: {url_path}")
-                
-                # Check for PDF signature
-                is_pdf = b'%PDF' in content[:100] or url_path.lower().endswith('.pdf') or 'pdf' in source.lower()
-                print(f"Is PDF: {is_pdf}")
-                
-                if is_pdf:
-                    return self.extract_text_from_pdf(content)
-                elif url_path.lower().endswith(('.docx', '.doc')) or 'docx' in source.lower() or 'doc' in source.lower():
-                    return self.extract_text_from_docx(content)
-                elif url_path.lower().endswith('.txt') or 'txt' in source.lower():
-                    return self.extract_text_from_txt(content)
-                else:
-                    # For Azure blob URLs, try PDF first, then text
-                    if 'blob.core.windows.net' in source:
-                        try:
-                            return self.extract_text_from_pdf(content)
-                        except:
-                            pass
-                    
-                    # Try as text
-                    try:
-                        text_content = content.decode('utf-8')
-                        if len(text_content.strip()) > 0:
-                            return text_content
-                    except:
-                        pass
-                    
-                    raise Exception(f"Unsupported document format. Content type not recognized from URL: {url_path}")
+                if self.load_shared_document(document_id):
+                    self.account_document(document_id)
+                    return True
             except Exception as e:
-                print(f"Error in extract_text: {str(e)}")
-                raise
-    
-    def chunk_text(self, text: str, chunk_size: int = 1500, overlap: int = 300) -> List[Dict]:
-        """Split text into chunks with metadata"""
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        # Split into sentences
-        sentences = re.split(r'[.!?]+', text)
-        
-        chunks = []
-        current_chunk = ""
-        chunk_id = 0
-        start_pos = 0
-        
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if not sentence:
-                continue
-                
-            if len(current_chunk) + len(sentence) > chunk_size and current_chunk:
-                chunks.append({
-                    "id": f"chunk_{chunk_id}",
-                    "text": current_chunk.strip(),
-                    "start_pos": start_pos,
-                    "end_pos": start_pos + len(current_chunk)
-                })
-                
-                overlap_text = current_chunk[-overlap:] if len(current_chunk) > overlap else current_chunk
-                current_chunk = overlap_text + " " + sentence
-                start_pos = start_pos + len(current_chunk) - len(overlap_text) - len(sentence)
-                chunk_id += 1
-            else:
-                current_chunk += " " + sentence if current_chunk else sentence
-        
-        if current_chunk.strip():
-            chunks.append({
-                "id": f"chunk_{chunk_id}",
-                "text": current_chunk.strip(),
-                "start_pos": start_pos,
-                "end_pos": start_pos + len(current_chunk)
-            })
-        
-        return chunks
-    
-    def simple_similarity(self, query: str, text: str) -> float:
-        """Simple text similarity using word overlap"""
-        query_words = set(query.lower().split())
-        text_words = set(text.lower().split())
-        
-        if not query_words or not text_words:
-            return 0.0
-        
-        intersection = query_words.intersection(text_words)
-        union = query_words.union(text_words)
-        
-        return len(intersection) / len(union) if union else 0.0
-    
-    def process_document(self, source: str, is_file_path: bool = False, file_content: bytes = None, filename: str = None) -> Dict:
-        """Complete document processing pipeline"""
+                print(f"⚠️  Failed to map shared document {document_id[:12]}: {e}")
+        if self.backing_store is None:
+            return False
+        try:
+            loaded = self.backing_store.load_content(document_id)
+            if loaded is None:
+                return False
+            text, offsets, indexes = loaded
+            chunks = ChunkList.from_offsets_bytes(text, offsets)
+        except Exception as e:
+            print(f"⚠️  Failed to load document {document_id[:12]}: {e}")
+            return False
+
+        self.document_chunks[document_id] = chunks
+        if indexes is not None:
+            self.document_indexes[document_id], self.document_matrices[document_id] = indexes[:2]
+            self.document_sections[document_id] = indexes[2] if len(indexes) > 2 else SectionIndex()
+        print(f"📦 Loaded document {document_id[:12]} from the persistent store ({len(chunks)} chunks)")
+        if indexes is not None:
+            self.share_document(document_id)
+        self.account_document(document_id)
+        return True
+
+    def cached_result(self, document_id: str) -> Dict:
+        """Result for a document whose content hash has already been processed"""
+        chunks = self.document_chunks[document_id]
+        return {
+            "success": True,
+            "cached": True,
+            "text": " ".join(chunk.text for chunk in chunks[:5]),
+            "chunks": len(chunks),
+            "document_id": document_id,
+            "message": f"Document already processed with {len(chunks)} chunks"
+        }
+
+    async def aprocess_document(self, source: str, is_file_path: bool = False, file_content: Union[bytes, str] = None,
+                                filename: str = None, document_id: str = None, status: Dict = None) -> Dict:
+        """Document processing pipeline: I/O and chunking on the thread pool, extraction, normalization and TF-IDF in the process pool
+
+        ``file_content`` is either the uploaded bytes or the path of a spooled
+        upload; pass ``document_id`` when its hash is already known. Each
+        stage (download, extract, index) holds a slot from ``stage_slots``,
+        and the result carries the seconds spent in each under ``timings``.
+        ``status``, when given, is updated in place with the current ``stage``
+        and, once the content is hashed, the ``document_id``.
+        """
+        loop = asyncio.get_running_loop()
+        downloaded = None
+        content_type = None
+        timings = {}
+        status = status if status is not None else {}
         try:
-            # Extract text
             if file_content and filename:
-                text = self.process_uploaded_file(file_content, filename)
-                document_id = hashlib.md5((filename + str(len(file_content))).encode()).hexdigest()
+                content = file_content
+                if document_id is None:
+                    document_id = await loop.run_in_executor(self.io_executor, content_document_id, file_content)
+            elif is_file_path:
+                content = None
+                document_id = await loop.run_in_executor(self.io_executor, content_document_id, source)
             else:
-                text = self.extract_text(source, is_file_path)
-                document_id = hashlib.md5(source.encode()).hexdigest()
-            
-            # Chunk text
-            chunks = self.chunk_text(text)
-            
-            # Store chunks in memory
-            self.document_chunks[document_id] = chunks
-            
-            return {
-                "success": True,
-                "text": text,
-                "chunks": len(chunks),
-                "document_id": document_id,
-                "message": f"Successfully processed document with {len(chunks)} chunks"
-            }
-        
+                # Streamed to memory or a spool file and hashed on the fly;
+                # large bodies reach the worker as a path
+                status["stage"] = "downloading"
+                async with self.stage_slots["download"]:
+                    started = time.perf_counter()
+                    downloaded = await self.downloader.download(source)
+                    timings["download"] = time.perf_counter() - started
+                content = downloaded.content
+                content_type = downloaded.content_type
+                document_id = downloaded.sha256
+                print(f"Downloaded {downloaded.size} bytes (sha256 {document_id[:12]}...)")
+            status["document_id"] = document_id
+
+            # Identical bytes are processed once, whatever URL or filename they came from
+            if await loop.run_in_executor(self.io_executor, self.ensure_document, document_id):
+                return self.cached_result(document_id)
+
+            async def extract_and_index() -> Dict:
+                # Other worker processes may be ingesting the same bytes: hold the
+                # cross-process lock and re-check once we own it
+                lock = None
+                if self.shared_index is not None:
+                    lock = await loop.run_in_executor(self.io_executor, self.shared_index.acquire, document_id)
+                try:
+                    if lock is not None and await loop.run_in_executor(self.io_executor, self.ensure_document, document_id):
+                        return self.cached_result(document_id)
+
+                    ingest = StreamingIngest(document_id)
+                    self.partial_documents[document_id] = ingest
+                    try:
+                        status["stage"] = "extracting"
+                        async with self.stage_slots["extract"]:
+                            started = time.perf_counter()
+                            await self.astream_extract(ingest, source, is_file_path, content, filename, content_type)
+                            timings["extract"] = time.perf_counter() - started
+                        status["stage"] = "indexing"
+                        async with self.stage_slots["index"]:
+                            started = time.perf_counter()
+                            text, chunks, page_offsets = await loop.run_in_executor(self.io_executor, ingest.finish)
+                            tfidf = await self.arun_cpu(fit_tfidf, list(chunks.texts()))
+                            await loop.run_in_executor(
+                                self.io_executor, self.index_document, document_id, chunks,
+                                ingest.builder.freeze(), ingest.sections, tfidf
+                            )
+                            timings["index"] = time.perf_counter() - started
+                    finally:
+                        self.partial_documents.pop(document_id, None)
+                finally:
+                    if lock is not None:
+                        self.shared_index.release(lock)
+
+                return {
+                    "success": True,
+                    "text": text,
+                    "chunks": len(chunks),
+                    "pages": len(page_offsets),
+                    "document_id": document_id,
+                    "timings": timings,
+                    "message": f"Successfully processed document with {len(chunks)} chunks"
+                }
+
+            return await self.inflight_extractions.do(document_id, extract_and_index)
+
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e)
             }
+        finally:
+            if downloaded is not None:
+                downloaded.close()
     
+    async def astream_extract(self, ingest: StreamingIngest, source: str, is_file_path: bool,
+                              content: Union[bytes, str, None], filename: str = None, content_type: str = None):
+        """Extract a document in the process pool and stream its pages into ``ingest``
+
+        The format comes from the magic bytes (then Content-Type, then the
+        name) and engines are tried fastest-first per document class. PDFs
+        are split into page ranges that the pool workers extract and normalize
+        in parallel; ranges are consumed in page order and chunked and indexed
+        as soon as they arrive. Other formats are extracted whole and fed in
+        as a single page.
+        """
+        loop = asyncio.get_running_loop()
+        document = source if is_file_path and content is None else content
+        if document is None:
+            raise Exception("No document content to extract")
+        fmt = await loop.run_in_executor(self.io_executor, detect_format, document, content_type, filename or source)
+        if fmt not in EXTRACTORS:
+            raise Exception(f"Unsupported document format: {fmt or 'unrecognized content'} ({filename or source})")
+        size = content_size(document)
+        doc_class = document_class(fmt, size)
+        engines = self.extraction_stats.engine_order(fmt, doc_class)
+        try:
+            if fmt == "pdf":
+                page_count, _ = await loop.run_in_executor(self.cpu_executor, count_pages, document, fmt, engines)
+                ingest.total_pages = page_count
+                ranges = split_page_ranges(page_count, math.ceil(page_count / max(1, PDF_MIN_PAGES_PER_TASK)))
+                futures = [
+                    loop.run_in_executor(self.cpu_executor, extract_normalized_pages, document, fmt, start, end, engines)
+                    for start, end in ranges
+                ]
+                used = set()
+                try:
+                    for future in futures:
+                        pages, engine, seconds = await future
+                        self.extraction_stats.record(doc_class, engine, seconds, len(pages),
+                                                     size * len(pages) // max(page_count, 1))
+                        used.add(engine)
+                        await loop.run_in_executor(self.io_executor, ingest.add_pages, pages)
+                finally:
+                    for future in futures:
+                        future.cancel()
+                print(f"📑 Extracted {page_count} PDF pages in {len(ranges)} range(s) with {', '.join(sorted(used))}")
+                return
+
+            pages, engine, seconds = await loop.run_in_executor(
+                self.cpu_executor, extract_normalized_pages, document, fmt, 0, None, engines
+            )
+            self.extraction_stats.record(doc_class, engine, seconds, len(pages), size)
+            ingest.total_pages = len(pages)
+            await loop.run_in_executor(self.io_executor, ingest.add_pages, pages)
+        except BrokenProcessPool:
+            # A crashed worker poisons the whole pool; start a fresh one next time
+            self._cpu_executor = None
+            raise
+
+    def ingest_progress(self, document_id: str) -> Optional[Dict]:
+        """Progress of an in-flight ingest, or None when the document is not being ingested"""
+        ingest = self.partial_documents.get(document_id)
+        return ingest.progress() if ingest is not None else None
+
+    def _retrieval_view(self, document_id: str) -> Optional[tuple]:
+        """``(chunks, bm25, sections)`` for a complete document, or for the indexed prefix of one still ingesting"""
+        if self.ensure_document(document_id):
+            return (self.document_chunks[document_id], self.get_index(document_id),
+                    self.document_sections.get(document_id))
+        ingest = self.partial_documents.get(document_id)
+        if ingest is not None:
+            return ingest.snapshot()
+        return None
+
+    def get_index(self, document_id: str) -> "BM25Index":
+        """Return the BM25 index for a document, building it on first use"""
+        index = self.document_indexes.get(document_id)
+        if index is None:
+            index = BM25Index.build(self.document_chunks[document_id].texts())
+            self.document_indexes[document_id] = index
+        return index
+
+    def build_tfidf_matrix(self, chunks: ChunkList):
+        """Fit a TF-IDF vectorizer on a document's chunks and return it with the chunk matrix"""
+        return fit_tfidf(chunks.texts()) if chunks else None
+
+    @staticmethod
+    def chunk_hit(chunk: Chunk, score: float, document_id: str, ranker: str, section: str = None) -> Dict:
+        """Retrieval result for one chunk; ``section`` labels a chunk found through a named section"""
+        hit = {
+            "score": score,
+            "text": chunk.text,
+            "chunk_id": chunk.id,
+            "start": chunk.start,
+            "end": chunk.end,
+            "document_id": document_id,
+            "ranker": ranker
+        }
+        if section is not None:
+            hit["section"] = section
+        return hit
+
+    def named_section_chunks(self, question: str, chunks: ChunkList, sections: Optional[SectionIndex]) -> tuple:
+        """Chunks of the sections a question names, mapped to the section's label, and whether to stay inside them
+
+        An explicit clause reference ("clause 4.2") restricts retrieval to
+        that clause; a heading the question mentions ("Exclusions") only
+        boosts its chunks, since heading words also occur in broader questions.
+        """
+        named = {}
+        if not sections:
+            return named, False
+        entries, explicit = sections.lookup(question)
+        for entry_idx in entries:
+            _, _, clause_id, title = sections.entries[entry_idx]
+            label = " ".join(part for part in (clause_id, title) if part)
+            for chunk_idx in sections.chunk_range(entry_idx, chunks):
+                named.setdefault(chunk_idx, label)
+        return named, explicit and bool(named)
+
+    @staticmethod
+    def rank_chunks(scores: Dict[int, float], named: Dict[int, str], restrict: bool, top_k: int) -> List[tuple]:
+        """Best ``(chunk_index, score)`` pairs from the sparse scores of the chunks matching a query
+
+        Chunks of named sections are boosted by ``SECTION_SCORE_BOOST`` or,
+        when ``restrict`` is set, are the only candidates; inside a
+        restricted section, chunks without a matching term follow the scored
+        ones in text order. Ties go to the earlier chunk.
+        """
+        if restrict:
+            ranked = sorted(((idx, scores.get(idx, 0.0)) for idx in named), key=lambda item: (-item[1], item[0]))
+            return ranked[:top_k]
+
+        if named:
+            scores = dict(scores)
+            for idx in named.keys() & scores.keys():
+                scores[idx] *= SECTION_SCORE_BOOST
+        return heapq.nlargest(top_k, ((idx, score) for idx, score in scores.items() if score > 0),
+                              key=lambda item: (item[1], -item[0]))
+
+    def search_similar_chunks_batch(self, queries: List[str], document_id: str, top_k: int = 5) -> List[List[Dict]]:
+        """Retrieve top_k chunks for every query with one sparse matrix multiply
+
+        Sections the query names (a clause number or heading) restrict or
+        boost the candidates before they are ranked; see ``rank_chunks``.
+        """
+        if not queries:
+            return []
+        if not self.ensure_document(document_id):
+            if document_id not in self.partial_documents:
+                # Never fall back to other documents' chunks
+                print(f"⚠️  Document {document_id[:12]} is not available for retrieval")
+                return [[] for _ in queries]
+            # Still ingesting: score the indexed prefix with BM25
+            return [self.search_similar_chunks(query, document_id, top_k) for query in queries]
+
+        chunks = self.document_chunks[document_id]
+        sections = self.document_sections.get(document_id)
+        if document_id not in self.document_matrices:
+            self.document_matrices[document_id] = self.build_tfidf_matrix(chunks)
+        tfidf = self.document_matrices[document_id]
+        if tfidf is None:
+            return [[] for _ in queries]
+
+        vectorizer, chunk_matrix = tfidf
+
+        # (questions x vocab) @ (vocab x chunks) -> cosine scores, rows are L2-normalized;
+        # the product stays sparse, so each row holds only the chunks sharing a term
+        query_matrix = vectorizer.transform(queries)
+        scores = (query_matrix @ chunk_matrix.T).tocsr()
+
+        results = []
+        for row, query in enumerate(queries):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            row_scores = dict(zip(scores.indices[start:end].tolist(), scores.data[start:end].tolist()))
+            named, restrict = self.named_section_chunks(query, chunks, sections)
+            results.append([
+                self.chunk_hit(chunks[chunk_idx], score, document_id, "tfidf", named.get(chunk_idx))
+                for chunk_idx, score in self.rank_chunks(row_scores, named, restrict, top_k)
+            ])
+        return results
+
     def search_similar_chunks(self, query: str, document_id: str = None, top_k: int = 5) -> List[Dict]:
-        """Search for similar chunks using simple text similarity"""
+        """Search for similar chunks using the per-document BM25 index, favouring sections the query names
+
+        Without ``document_id`` every document in memory is searched. A given
+        ``document_id`` that can be neither loaded nor found mid-ingest yields
+        no hits, never another document's chunks.
+        """
         try:
             results = []
             
             # Search in specific document or all documents
-            if document_id and document_id in self.document_chunks:
-                chunks = self.document_chunks[document_id]
-                for chunk in chunks:
-                    score = self.simple_similarity(query, chunk["text"])
-                    if score > 0:
-                        results.append({
-                            "score": score,
-                            "text": chunk["text"],
-                            "chunk_id": chunk["id"],
-                            "document_id": document_id
-                        })
+            if document_id:
+                view = self._retrieval_view(document_id)
+                if view is None:
+                    print(f"⚠️  Document {document_id[:12]} is not available for retrieval")
+                views = {document_id: view}
             else:
-                # Search in all documents
-                for doc_id, chunks in self.document_chunks.items():
-                    for chunk in chunks:
-                        score = self.simple_similarity(query, chunk["text"])
-                        if score > 0:
-                            results.append({
-                                "score": score,
-                                "text": chunk["text"],
-                                "chunk_id": chunk["id"],
-                                "document_id": doc_id
-                            })
+                views = {doc_id: self._retrieval_view(doc_id) for doc_id in list(self.document_chunks.keys())}
+
+            for doc_id, view in views.items():
+                if view is None:
+                    continue
+                chunks, index, sections = view
+                named, restrict = self.named_section_chunks(query, chunks, sections)
+                for chunk_idx, score in self.rank_chunks(index.score(query), named, restrict, top_k):
+                    results.append(self.chunk_hit(chunks[chunk_idx], score, doc_id, "bm25", named.get(chunk_idx)))
             
             # Sort by score and return top_k
             results.sort(key=lambda x: x["score"], reverse=True)
@@ -271,8 +1294,75 @@ class SimpleDocumentProcessor:
             print(f"Search error: {e}")
             return []
     
-    def generate_answer(self, question: str, relevant_chunks: List[Dict]) -> Dict:
-        """Generate answer using Gemini"""
+    async def asearch_similar_chunks_batch(self, queries: List[str], document_id: str, top_k: int = 5) -> List[List[Dict]]:
+        """Run search_similar_chunks_batch on the I/O thread pool; a cold document is reloaded there, off the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_executor, self.search_similar_chunks_batch, queries, document_id, top_k)
+
+    async def asearch_similar_chunks(self, query: str, document_id: str = None, top_k: int = 5) -> List[Dict]:
+        """Run search_similar_chunks on the I/O thread pool without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_executor, self.search_similar_chunks, query, document_id, top_k)
+
+    def cached_answer(self, question: str, relevant_chunks: List[Dict]) -> Optional[Dict]:
+        """Answer from the exact or the near-duplicate answer cache, or None"""
+        if self.answer_cache is not None:
+            cached = self.answer_cache.get(answer_key(question, relevant_chunks))
+            if cached is not None:
+                return {
+                    "answer": cached["answer"],
+                    "relevant_chunks": relevant_chunks,
+                    "reasoning": cached["reasoning"],
+                    "cached": True
+                }
+
+        if self.semantic_cache is not None:
+            similar = self.semantic_cache.get(question, relevant_chunks)
+            if similar is not None:
+                return {
+                    "answer": similar["answer"],
+                    "relevant_chunks": relevant_chunks,
+                    "reasoning": f"{similar['reasoning']} (reused from the similar question \"{similar['question']}\")",
+                    "cached": True
+                }
+        return None
+
+    def extractive_answer(self, question: str, relevant_chunks: List[Dict], min_coverage: float = None) -> Optional[Dict]:
+        """Answer a duration/amount/percentage lookup with the sentence stating it, or None when not confident"""
+        extracted = extract_answer(question, relevant_chunks, min_coverage or EXTRACTIVE_MIN_COVERAGE)
+        if extracted is None:
+            return None
+        return {
+            "answer": extracted["answer"],
+            "relevant_chunks": relevant_chunks,
+            "reasoning": (f"Extracted the {extracted['kind']} \"{extracted['value']}\" from clause {extracted['chunk_id']} "
+                          f"(matched {extracted['confidence']:.0%} of the question terms)"),
+            "extractive": True
+        }
+
+    def remember_answer(self, question: str, relevant_chunks: List[Dict], answer: str, reasoning: str):
+        """Store a freshly generated answer in the answer caches"""
+        value = {"answer": answer, "reasoning": reasoning}
+        if self.answer_cache is not None:
+            self.answer_cache.put(answer_key(question, relevant_chunks), value)
+        if self.semantic_cache is not None:
+            self.semantic_cache.put(question, relevant_chunks, value)
+
+    def call_gemini(self, prompt: str):
+        """``generate_content`` that raises TimeoutError after GEMINI_TIMEOUT_SECONDS
+
+        google-generativeai 0.3.2 takes no per-request timeout, so the request
+        runs on ``llm_executor`` and is abandoned, not interrupted, when late.
+        """
+        future = self.llm_executor.submit(self.gemini_model.generate_content, prompt)
+        try:
+            return future.result(timeout=GEMINI_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Gemini did not answer within {GEMINI_TIMEOUT_SECONDS:g}s")
+
+    def generate_answer(self, question: str, relevant_chunks: List[Dict], check_cache: bool = True) -> Dict:
+        """Generate answer using Gemini; ``check_cache=False`` when the caller already missed the answer caches"""
         if not relevant_chunks:
             return {
                 "answer": "I couldn't find relevant information in the document to answer your question.",
@@ -280,7 +1370,18 @@ class SimpleDocumentProcessor:
                 "reasoning": "No relevant document sections found"
             }
             
-        context = "\n\n".join([f"[Clause {chunk['chunk_id']}]: {chunk['text']}" for chunk in relevant_chunks])
+        cached = self.cached_answer(question, relevant_chunks) if check_cache else None
+        if cached is not None:
+            return cached
+
+        # Simple factual lookups are answered from the top clause without an LLM call
+        if EXTRACTIVE_ANSWERS:
+            extracted = self.extractive_answer(question, relevant_chunks)
+            if extracted is not None:
+                return extracted
+
+        # Adaptive k, overlapping chunks merged, within the token budget
+        context = build_context(relevant_chunks)
         
         prompt = f"""
         You are an intelligent document analysis agent specializing in insurance, legal, HR, and compliance domains.
@@ -308,15 +1409,161 @@ class SimpleDocumentProcessor:
         """
         
         try:
-            response = self.gemini_model.generate_content(prompt)
+            response = self.call_gemini(prompt)
+            reasoning = f"Answer based on {retrieval_label(relevant_chunks)} retrieval of {len(relevant_chunks)} document clauses"
+            self.remember_answer(question, relevant_chunks, response.text, reasoning)
             return {
                 "answer": response.text,
                 "relevant_chunks": relevant_chunks,
-                "reasoning": f"Answer based on simple text similarity search of {len(relevant_chunks)} document clauses"
+                "reasoning": reasoning
             }
         except Exception as e:
+            # Timed out or failed: a less certain extractive answer still beats an error
+            fallback = self.extractive_answer(question, relevant_chunks, EXTRACTIVE_FALLBACK_COVERAGE)
+            if fallback is not None:
+                fallback["reasoning"] += f"; used because the LLM call failed: {str(e)}"
+                return fallback
             return {
                 "answer": f"Error generating answer: {str(e)}",
                 "relevant_chunks": relevant_chunks,
                 "reasoning": "Error occurred during LLM processing"
             }
+
+    async def agenerate_answer(self, question: str, relevant_chunks: List[Dict], check_cache: bool = True) -> Dict:
+        """Run generate_answer on the I/O thread pool without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_executor, self.generate_answer, question, relevant_chunks, check_cache)
+
+    async def agenerate_answers(self, questions: List[str], chunk_lists: List[List[Dict]], max_concurrency: int = None,
+                                check_cache: bool = True) -> List[Dict]:
+        """Generate answers for several questions concurrently, bounded by a semaphore; order is preserved"""
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or GEMINI_MAX_CONCURRENCY))
+
+        async def answer_one(question: str, relevant_chunks: List[Dict]) -> Dict:
+            async with semaphore:
+                return await self.agenerate_answer(question, relevant_chunks, check_cache)
+
+        results = await asyncio.gather(
+            *(answer_one(question, relevant_chunks) for question, relevant_chunks in zip(questions, chunk_lists)),
+            return_exceptions=True
+        )
+        return [
+            result if not isinstance(result, BaseException) else {
+                "answer": f"Error generating answer: {str(result)}",
+                "relevant_chunks": relevant_chunks,
+                "reasoning": "Error occurred during LLM processing"
+            }
+            for result, relevant_chunks in zip(results, chunk_lists)
+        ]
+
+    def generate_batched_answers(self, questions: List[str], chunk_lists: List[List[Dict]]) -> List[Optional[Dict]]:
+        """Answer several questions with one Gemini call over the union of their retrieved clauses
+
+        The instructions and any clause shared between questions are sent once
+        and the prompt asks for a JSON reply (parse_batched_answers drops any
+        Markdown fence around it). Questions the model did not answer (or every
+        question, if the reply does not parse) come back as None.
+        """
+        # Each question keeps its own adaptive k; shared and overlapping clauses are merged
+        context = build_context(
+            [chunk for relevant_chunks in chunk_lists for chunk in select_context_hits(relevant_chunks)],
+            token_budget=CONTEXT_TOKEN_BUDGET * len(questions), adaptive=False
+        )
+        numbered = "\n".join(f"{number}. {question}" for number, question in enumerate(questions, 1))
+
+        prompt = f"""
+        You are an intelligent document analysis agent specializing in insurance, legal, HR, and compliance domains.
+
+        Based on the following document clauses, answer each of the numbered user questions.
+
+        DOCUMENT CLAUSES:
+        {context}
+
+        USER QUESTIONS:
+        {numbered}
+
+        INSTRUCTIONS:
+        1. Answer every question separately, based ONLY on the document content
+        2. If the document doesn't contain sufficient information for a question, state that clearly
+        3. Be precise, professional, concise but comprehensive
+        4. Cite specific clause numbers or sections when possible
+
+        Reply with JSON only, no other text, in exactly this form:
+        {{"answers": [{{"id": <question number>, "answer": "<answer>"}}]}}
+        """
+
+        try:
+            response = self.call_gemini(prompt)
+            answers = parse_batched_answers(response.text, len(questions))
+        except Exception as e:
+            print(f"⚠️  Batched answer failed for {len(questions)} questions, asking one by one: {e}")
+            return [None] * len(questions)
+
+        results = []
+        for number, (question, relevant_chunks) in enumerate(zip(questions, chunk_lists), 1):
+            answer = answers.get(number)
+            if answer is None:
+                results.append(None)
+                continue
+            reasoning = (f"Answer based on {retrieval_label(relevant_chunks)} retrieval of {len(relevant_chunks)} document clauses "
+                         f"(answered in one prompt with {len(questions) - 1} other question(s))")
+            self.remember_answer(question, relevant_chunks, answer, reasoning)
+            results.append({
+                "answer": answer,
+                "relevant_chunks": relevant_chunks,
+                "reasoning": reasoning
+            })
+        return results
+
+    async def agenerate_answers_batched(self, questions: List[str], chunk_lists: List[List[Dict]],
+                                        batch_size: int = None, max_concurrency: int = None) -> List[Dict]:
+        """agenerate_answers with up to ``batch_size`` uncached questions per Gemini prompt
+
+        Cached, extractive and clause-less answers are settled first; any
+        question a batch leaves unanswered falls back to its own call.
+        """
+        loop = asyncio.get_running_loop()
+        batch_size = max(1, batch_size or ANSWER_BATCH_SIZE)
+
+        def settle(question: str, relevant_chunks: List[Dict]) -> Optional[Dict]:
+            if not relevant_chunks:
+                return self.generate_answer(question, relevant_chunks)
+            answer = self.cached_answer(question, relevant_chunks)
+            if answer is None and EXTRACTIVE_ANSWERS:
+                answer = self.extractive_answer(question, relevant_chunks)
+            return answer
+
+        def settle_all() -> List[Optional[Dict]]:
+            return [settle(question, relevant_chunks) for question, relevant_chunks in zip(questions, chunk_lists)]
+
+        results = await loop.run_in_executor(self.io_executor, settle_all)
+        pending = [idx for idx, result in enumerate(results) if result is None]
+        batches = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or GEMINI_MAX_CONCURRENCY))
+
+        async def answer_batch(batch: List[int]) -> List[Optional[Dict]]:
+            if len(batch) == 1:
+                return [None]
+            async with semaphore:
+                return await loop.run_in_executor(
+                    self.io_executor, self.generate_batched_answers,
+                    [questions[idx] for idx in batch], [chunk_lists[idx] for idx in batch]
+                )
+
+        for batch, answers in zip(batches, await asyncio.gather(*(answer_batch(batch) for batch in batches))):
+            for idx, answer in zip(batch, answers):
+                results[idx] = answer
+
+        # settle() already missed the caches for these, so they are not looked up (and counted) again
+        fallback = [idx for idx, result in enumerate(results) if result is None]
+        if fallback:
+            answers = await self.agenerate_answers(
+                [questions[idx] for idx in fallback], [chunk_lists[idx] for idx in fallback], max_concurrency,
+                check_cache=False
+            )
+            for idx, answer in zip(fallback, answers):
+                results[idx] = answer
+
+        calls = sum(len(batch) > 1 for batch in batches) + len(fallback)
+        print(f"🧮 Answered {len(questions)} questions ({len(questions) - len(pending)} without an LLM call) with {calls} Gemini call(s)")
+        return results